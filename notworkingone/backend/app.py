@@ -1,8 +1,14 @@
+import signal
+import sys
 from flask import Flask
 from flask_cors import CORS
 from database import init_db
 from routes import auth_bp, camera_bp, detection_bp, dashboard_bp, incident_bp, admin_bp
-from stream import start_mqtt_client
+from stream import start_mqtt_client, start_capture_threads
+from detection_cache import detection_cache
+from image_store import start_image_sweeper
+from statebus import state_bus_server, state_bus_client
+from config import SERVER_ROLE, INGEST_RUNTIME
 
 
 app = Flask(__name__)
@@ -17,10 +23,32 @@ app.register_blueprint(incident_bp)
 app.register_blueprint(admin_bp)
 
 
-init_db()
+def start_services():
+    
+    # Not at import time: spawned decode processes re-import this module as __mp_main__.
+    # "all" runs everything in one process; "ingest" owns the schema, cameras and MQTT for a pool
+    # of "web" workers, which only open connections so they never race it for the write lock.
+    if INGEST_RUNTIME not in ("paho", "async"):
+        raise RuntimeError(f"Unknown INGEST_RUNTIME {INGEST_RUNTIME!r}; use 'paho' or 'async'")
+    if SERVER_ROLE in ("all", "ingest"):
+        init_db()
+        detection_cache.warm()
+        start_image_sweeper()
+        if INGEST_RUNTIME == "async":
+            from ingest_async import start_async_ingest
+            start_async_ingest()
+            start_capture_threads()
+        else:
+            start_mqtt_client()
+    else:
+        state_bus_client.start()
 
 
-start_mqtt_client()
-
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
+    # docker stop sends SIGTERM; exit normally so atexit stops the capture workers.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    start_services()
+    if SERVER_ROLE == "ingest":
+        state_bus_server.serve_forever()
+    else:
+        app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
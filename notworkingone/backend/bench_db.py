@@ -0,0 +1,149 @@
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import database
+from config import DEFAULT_WEAPONS
+
+
+HOT_QUERIES = [
+    ("detection cooldown", '''
+        SELECT id, detection_time, image_path FROM detection_logs
+        WHERE camera_id = ? AND weapon_type = ? AND detection_time >= ?
+        ORDER BY detection_time DESC LIMIT 1
+    ''', lambda now: (1, 'pistol', now - timedelta(minutes=1))),
+    ("open incident lookup", '''
+        SELECT id, status FROM incidents
+        WHERE camera_id = ? AND weapon_type = ? AND detected_at >= ? AND status IN ('pending', 'responding')
+        ORDER BY detected_at DESC LIMIT 1
+    ''', lambda now: (1, 'pistol', now - timedelta(minutes=1))),
+    ("detection logs (7 days)", '''
+        SELECT dl.*, c.camera_name, c.location, u.username, i.incident_number, i.status as incident_status
+        FROM detection_logs dl
+        JOIN cameras c ON dl.camera_id = c.id
+        JOIN users u ON dl.user_id = u.id
+        LEFT JOIN incidents i ON dl.incident_id = i.id
+        WHERE dl.date_only >= date('now', '-7 days') AND dl.camera_id = ?
+        ORDER BY dl.detection_time DESC LIMIT 100
+    ''', lambda now: (2,)),
+    ("incidents list", '''
+        SELECT i.*, c.camera_name, c.location as camera_location
+        FROM incidents i
+        JOIN cameras c ON i.camera_id = c.id
+        WHERE i.status = ?
+        ORDER BY i.detected_at DESC LIMIT 100
+    ''', lambda now: ('pending',)),
+    ("dashboard weapon totals", '''
+        SELECT ds.weapon_type, SUM(ds.total_detections) as total, AVG(ds.avg_confidence) as avg_conf
+        FROM daily_summary ds
+        WHERE ds.detection_date >= date('now', '-7 days')
+        GROUP BY ds.weapon_type ORDER BY total DESC
+    ''', lambda now: ()),
+]
+
+
+def seed(conn, rows, days):
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = 'system'")
+    user_id = cursor.fetchone()[0]
+    cursor.execute("SELECT id FROM cameras")
+    camera_ids = [r[0] for r in cursor.fetchall()]
+
+    now   = datetime.now()
+    step  = timedelta(days=days) / rows
+    batch = []
+    incidents = []
+    summary = {}
+    for n in range(rows):
+        ts     = now - step * (rows - n)
+        cam    = random.choice(camera_ids)
+        weapon = random.choice(DEFAULT_WEAPONS)
+        conf   = random.uniform(0.5, 1.0)
+        batch.append((n + 1, user_id, cam, weapon, conf, ts, ts.date()))
+        if n % 10 == 0:
+            status = 'resolved' if ts < now - timedelta(days=1) else random.choice(['pending', 'responding'])
+            incidents.append((f"INC-BENCH-{n}", cam, weapon, n + 1, user_id, ts, status))
+        key = (cam, ts.date(), weapon)
+        count, total = summary.get(key, (0, 0.0))
+        summary[key] = (count + 1, total + conf)
+        if len(batch) >= 50000:
+            cursor.executemany('''INSERT INTO detection_logs
+                                  (id, user_id, camera_id, weapon_type, confidence_score, detection_time, date_only)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?)''', batch)
+            batch.clear()
+    if batch:
+        cursor.executemany('''INSERT INTO detection_logs
+                              (id, user_id, camera_id, weapon_type, confidence_score, detection_time, date_only)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)''', batch)
+    cursor.executemany('''INSERT INTO incidents
+                          (incident_number, camera_id, weapon_type, detection_id, created_by, detected_at, status)
+                          VALUES (?, ?, ?, ?, ?, ?, ?)''', incidents)
+    cursor.executemany('''INSERT OR REPLACE INTO daily_summary
+                          (user_id, camera_id, detection_date, weapon_type, total_detections, avg_confidence)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       [(user_id, cam, d, w, c, t / c) for (cam, d, w), (c, t) in summary.items()])
+    conn.commit()
+
+
+def set_indexes(conn, enabled):
+
+    cursor = conn.cursor()
+    for _, sql in database.SCHEMA_MIGRATIONS:
+        if not sql.startswith("CREATE INDEX"):
+            continue
+        name = re.search(r"EXISTS (\w+)", sql).group(1)
+        cursor.execute(sql if enabled else f"DROP INDEX IF EXISTS {name}")
+    cursor.execute("ANALYZE")
+    conn.commit()
+
+
+def run_queries(conn, repeat):
+
+    now = datetime.now()
+    for label, sql, params in HOT_QUERIES:
+        args = params(now)
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, args).fetchall()
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+        print(f"  {label}: median {timings[len(timings) // 2] * 1000:.2f} ms")
+        for row in plan:
+            print(f"      {row[3]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a detection database and compare hot query plans with and without indexes.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="bench_users.db")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    database.DATABASE = args.db
+    database.init_db()
+
+    conn = sqlite3.connect(args.db, detect_types=0)
+    t0 = time.perf_counter()
+    seed(conn, args.rows, args.days)
+    print(f"Seeded {args.rows:,} detections in {time.perf_counter() - t0:.1f}s")
+
+    for enabled in (False, True):
+        set_indexes(conn, enabled)
+        print(f"\n{'With' if enabled else 'Without'} indexes:")
+        run_queries(conn, args.repeat)
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import random
+import time
+import cv2
+import numpy as np
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+
+CAPTURE_BACKOFF_BASE = 0.5
+CAPTURE_BACKOFF_MAX  = 60.0
+
+RING_SLOTS = 4
+
+
+CaptureSettings = namedtuple(
+    "CaptureSettings", ["rtsp_url", "max_width", "max_height", "target_fps"]
+)
+
+
+def open_capture(rtsp_url):
+    c = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+    if c.isOpened():
+        c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        c.set(cv2.CAP_PROP_FPS, 10)
+        return c
+    c.release()
+    return None
+
+
+def backoff_delay(failures):
+    # Full-jitter exponential backoff so dead URLs don't retry in lockstep.
+    ceiling = min(CAPTURE_BACKOFF_MAX, CAPTURE_BACKOFF_BASE * (2 ** failures))
+    return random.uniform(CAPTURE_BACKOFF_BASE, ceiling)
+
+
+def fit_frame(frame, max_width=None, max_height=None):
+    h, w  = frame.shape[:2]
+    scale = min((max_width or w) / w, (max_height or h) / h, 1.0)
+    if scale >= 1.0:
+        return frame, 1.0
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+
+def run_capture(settings, stop_event, on_frame, on_state):
+
+    cap            = None
+    failures       = 0
+    frame_interval = 1.0 / settings.target_fps if settings.target_fps else 0.0
+    next_due       = 0.0
+    try:
+        while not stop_event.is_set():
+            if cap is None:
+                on_state("connecting", False)
+                cap = open_capture(settings.rtsp_url)
+                if cap is None:
+                    failures += 1
+                    on_state("backoff", True)
+                    stop_event.wait(backoff_delay(failures))
+                    continue
+
+            t0 = time.monotonic()
+            # grab() keeps the stream drained without the colour conversion and copy of retrieve().
+            skip = frame_interval and t0 < next_due
+            if skip:
+                ok, frame = cap.grab(), None
+            else:
+                ok, frame = cap.read()
+            if not ok or (not skip and frame is None):
+                cap.release()
+                cap = None
+                failures += 1
+                on_state("backoff", True)
+                stop_event.wait(backoff_delay(failures))
+                continue
+
+            failures = 0
+            if skip:
+                continue
+
+            if stop_event.is_set():
+                # read() can block for a long time; a replaced camera must not publish one last frame.
+                break
+
+            next_due     = t0 + frame_interval
+            frame, scale = fit_frame(frame, settings.max_width, settings.max_height)
+            on_frame(frame, time.monotonic() - t0, scale)
+    finally:
+        if cap is not None:
+            cap.release()
+        on_state("stopped", False)
+
+
+
+
+class SharedFrameRing:
+
+
+    def __init__(self, shm, shape, slots=RING_SLOTS):
+        self.shm        = shm
+        self.shape      = tuple(shape)
+        self.slots      = slots
+        self.frame_size = int(np.prod(self.shape))
+        # One generation counter per slot ahead of the frames, seqlock-style: odd while a write is
+        # in progress, bumped again when it finishes. Readers never wait on the writer.
+        self.gens       = np.ndarray((slots,), dtype=np.uint64, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, slots=RING_SLOTS):
+        size = 8 * slots + int(np.prod(shape)) * slots
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, slots)
+
+    @classmethod
+    def attach(cls, name, shape, slots=RING_SLOTS, track=True):
+        shm = shared_memory.SharedMemory(name=name)
+        if not track:
+            # Attaching registers the segment with this process's resource tracker, which would
+            # unlink it when an unrelated process (e.g. a web worker) exits.
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, shape, slots)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def view(self, slot):
+        return np.ndarray(
+            self.shape, dtype=np.uint8, buffer=self.shm.buf,
+            offset=8 * self.slots + slot * self.frame_size
+        )
+
+    def write(self, slot, frame):
+        self.gens[slot] += 1
+        np.copyto(self.view(slot), frame)
+        self.gens[slot] += 1
+        return int(self.gens[slot])
+
+    def read(self, slot, gen):
+        # A copy of the frame written as generation gen, or None once the writer has lapped it.
+        if int(self.gens[slot]) != gen:
+            return None
+        frame = self.view(slot).copy()
+        if int(self.gens[slot]) != gen:
+            return None
+        return frame
+
+    def close(self, unlink=False):
+        self.gens = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Frames handed to viewers still reference the mapping; it is freed with them.
+            pass
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def decode_process_main(settings, conn, stop_event):
+
+    ring = None
+    seq  = 0
+
+    def on_frame(frame, decode_seconds, scale):
+        nonlocal ring, seq
+        if ring is None or ring.shape != frame.shape:
+            old  = ring
+            ring = SharedFrameRing.create(frame.shape)
+            conn.send(("ring", ring.name, ring.shape))
+            if old is not None:
+                old.close(unlink=True)
+        slot = seq % ring.slots
+        gen  = ring.write(slot, frame)
+        seq += 1
+        conn.send(("frame", slot, gen, decode_seconds, scale))
+
+    def on_state(state, reconnect):
+        conn.send(("state", state, reconnect))
+
+    try:
+        run_capture(settings, stop_event, on_frame, on_state)
+    except (BrokenPipeError, EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if ring is not None:
+            ring.close(unlink=True)
+        conn.close()
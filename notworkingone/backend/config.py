@@ -5,7 +5,81 @@ from passlib.context import CryptContext
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_SECRET")
 JWT_ALGO = "HS256"
 JWT_EXPIRATION = 3600  
-DATABASE = "users.db"
+DATABASE = os.getenv("DATABASE", "users.db")
+
+
+DB_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = 15.0
+
+
+INGEST_QUEUE_SIZE     = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+INGEST_BATCH_SIZE     = 50
+INGEST_SUBMIT_TIMEOUT = 5.0
+
+
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "thread")
+
+
+EVENT_SUBSCRIBER_QUEUE = 100
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+POSTPROCESS_WORKERS    = int(os.getenv("POSTPROCESS_WORKERS", "4"))
+POSTPROCESS_QUEUE_SIZE = int(os.getenv("POSTPROCESS_QUEUE_SIZE", "200"))
+
+
+SNAPSHOT_QUEUE_SIZE   = int(os.getenv("SNAPSHOT_QUEUE_SIZE", "100"))
+SNAPSHOT_JPEG_QUALITY = 80
+
+
+IMAGE_RETENTION_DAYS       = int(os.getenv("IMAGE_RETENTION_DAYS", "0"))
+IMAGE_SWEEP_INTERVAL       = 3600
+IMAGE_CACHE_MAX_AGE        = 365 * 24 * 3600
+LEGACY_IMAGE_CACHE_MAX_AGE = 3600
+
+
+THUMBNAIL_SIZES        = {"small": 160, "medium": 480}
+THUMBNAIL_JPEG_QUALITY = 75
+
+
+PAGE_SIZE_DEFAULT  = 100
+PAGE_SIZE_MAX      = 500
+COUNT_ESTIMATE_CAP = 10000
+EXPORT_BATCH_SIZE  = 500
+
+
+DASHBOARD_CACHE_ENTRIES = 64
+DASHBOARD_CACHE_MIN_AGE = 2.0
+
+
+ANALYTICS_DEFAULT_POINTS = 60
+ANALYTICS_MAX_POINTS     = 500
+
+
+MQTT_HOST         = os.getenv("MQTT_HOST", "fd2249eedb6c43fdbf9e9d318ab38fe4.s1.eu.hivemq.cloud")
+MQTT_PORT         = int(os.getenv("MQTT_PORT", "8883"))
+MQTT_TLS          = os.getenv("MQTT_TLS", "1") == "1"
+MQTT_USERNAME     = os.getenv("MQTT_USERNAME", "hivemq.webclient.1757927568300")
+MQTT_PASSWORD     = os.getenv("MQTT_PASSWORD", "r$i.g1>23O5TMdLAcp:H")
+MQTT_SHARED_GROUP = os.getenv("MQTT_SHARED_GROUP", "")
+
+
+SERVER_ROLE            = os.getenv("SERVER_ROLE", "all")
+STATE_BUS_SOCKET       = os.getenv("STATE_BUS_SOCKET", "/tmp/weapon-detection-bus.sock")
+STATE_BUS_CLIENT_QUEUE = 256
+STATE_BUS_CALL_TIMEOUT = 10.0
+
+# More than one process writes detections whenever ingest is split out or shared.
+DEDUP_RECHECK = bool(MQTT_SHARED_GROUP) or SERVER_ROLE != "all"
+
+
+# "paho" or "async"; picks which MQTT consumer the all/ingest roles run. Never both.
+INGEST_RUNTIME              = os.getenv("INGEST_RUNTIME", "paho")
+ASYNC_INGEST_QUEUE_SIZE     = int(os.getenv("ASYNC_INGEST_QUEUE_SIZE", "1000"))
+ASYNC_INGEST_INFLIGHT       = 256
+ASYNC_INGEST_RETRY          = 0.01
+ASYNC_INGEST_TOPIC_SYNC     = 2.0
+ASYNC_INGEST_STATS_INTERVAL = 60.0
 
 
 pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
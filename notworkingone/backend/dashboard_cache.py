@@ -0,0 +1,96 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from config import DASHBOARD_CACHE_ENTRIES, DASHBOARD_CACHE_MIN_AGE
+from ingest import detection_writer
+
+
+CachedDashboard = namedtuple("CachedDashboard", ["version", "etag", "body", "built_at"])
+
+
+class DashboardCache:
+
+
+    def __init__(self, max_entries=DASHBOARD_CACHE_ENTRIES, min_age=DASHBOARD_CACHE_MIN_AGE):
+        self.max_entries = max_entries
+        self.min_age     = min_age
+        self._entries    = OrderedDict()
+        self._builders   = {}
+        self._lock       = threading.Lock()
+        self._listeners  = []
+        self.version     = 0
+
+        self.hits          = 0
+        self.misses        = 0
+        self.invalidations = 0
+
+    def add_invalidate_listener(self, fn):
+        self._listeners.append(fn)
+
+    def invalidate(self, propagate=True):
+        with self._lock:
+            self.version       += 1
+            self.invalidations += 1
+        # Listeners pass the invalidation on to other processes; a forwarded one must not bounce back.
+        if propagate:
+            for fn in self._listeners:
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"⚠️  Dashboard invalidate listener error: {e}")
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # Under sustained ingest, a just-built entry is served for min_age instead of rebuilding per write.
+        if entry.version == self.version or time.monotonic() - entry.built_at < self.min_age:
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def get(self, key, compute):
+
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            builder = self._builders.setdefault(key, threading.Lock())
+
+        # One viewer rebuilds a stale key; the rest wait for it rather than each running the queries.
+        with builder:
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                version = self.version
+
+            body  = json.dumps(compute(), default=str)
+            entry = CachedDashboard(version, hashlib.sha1(body.encode()).hexdigest(), body, time.monotonic())
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._builders.pop(evicted, None)
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries":       len(self._entries),
+                "version":       self.version,
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+dashboard_cache = DashboardCache()
+detection_writer.add_commit_listener(dashboard_cache.invalidate)
@@ -1,23 +1,220 @@
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from config import DATABASE, pwd_ctx, DEFAULT_ADMIN, SYSTEM_USER, DEFAULT_WEAPONS, DEFAULT_CAMERAS
+from config import DATABASE, DB_POOL_SIZE, DB_POOL_TIMEOUT, pwd_ctx, DEFAULT_ADMIN, SYSTEM_USER, DEFAULT_WEAPONS, DEFAULT_CAMERAS
+
+
+# resolution -> (table, SQL expression mapping a timestamp to the start of its bucket)
+ROLLUPS = {
+    "hour":  ("hourly_summary",  "strftime('%Y-%m-%d %H:00:00', {ts})"),
+    "week":  ("weekly_summary",  "date({ts}, 'weekday 0', '-6 days')"),
+    "month": ("monthly_summary", "strftime('%Y-%m-01', {ts})"),
+}
+
+
+def rollup_rebuild_sql(table, bucket, where="1"):
+    return f'''INSERT OR REPLACE INTO {table}
+               (camera_id, bucket_start, weapon_type, total_detections, sum_confidence,
+                avg_confidence, first_detection, last_detection)
+               SELECT camera_id, {bucket.format(ts="detection_time")}, weapon_type, COUNT(*),
+                      COALESCE(SUM(confidence_score), 0), COALESCE(SUM(confidence_score), 0) / COUNT(*),
+                      MIN(detection_time), MAX(detection_time)
+               FROM detection_logs
+               WHERE {where}
+               GROUP BY 1, 2, 3'''
+
+
+SCHEMA_MIGRATIONS = [
+    (1, "CREATE INDEX IF NOT EXISTS idx_detection_logs_cooldown "
+        "ON detection_logs (camera_id, weapon_type, detection_time)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_detection_logs_date "
+        "ON detection_logs (date_only)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_detection_logs_time "
+        "ON detection_logs (detection_time)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_detection_logs_incident "
+        "ON detection_logs (incident_id)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_incidents_open "
+        "ON incidents (camera_id, weapon_type, detected_at, status)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_incidents_detected_at "
+        "ON incidents (detected_at)"),
+    (1, "CREATE INDEX IF NOT EXISTS idx_daily_summary_date "
+        "ON daily_summary (detection_date, camera_id)"),
+    (2, "UPDATE daily_summary SET sum_confidence = COALESCE(avg_confidence, 0) * total_detections"),
+    # Keyset pages walk (time, id) newest-first; id is the rowid, so it rides along in every index.
+    (3, "CREATE INDEX IF NOT EXISTS idx_incidents_status_time "
+        "ON incidents (status, detected_at)"),
+    (3, "CREATE INDEX IF NOT EXISTS idx_detection_logs_camera_time "
+        "ON detection_logs (camera_id, detection_time)"),
+    (4, "UPDATE detection_logs SET minute_of_day = "
+        "CAST(strftime('%H', detection_time) AS INTEGER) * 60 + CAST(strftime('%M', detection_time) AS INTEGER)"),
+    (4, "UPDATE incidents SET minute_of_day = "
+        "CAST(strftime('%H', detected_at) AS INTEGER) * 60 + CAST(strftime('%M', detected_at) AS INTEGER)"),
+    (4, "CREATE INDEX IF NOT EXISTS idx_detection_logs_minute "
+        "ON detection_logs (minute_of_day, detection_time)"),
+    (4, "CREATE INDEX IF NOT EXISTS idx_incidents_minute "
+        "ON incidents (minute_of_day, detected_at)"),
+    *[(5, rollup_rebuild_sql(table, bucket)) for table, bucket in ROLLUPS.values()],
+]
+
+
+def apply_schema_migrations(cursor):
+    
+    cursor.execute("PRAGMA user_version")
+    current = cursor.fetchone()[0]
+    target  = current
+    for version, sql in SCHEMA_MIGRATIONS:
+        if version > current:
+            cursor.execute(sql)
+            target = max(target, version)
+    if target != current:
+        cursor.execute(f"PRAGMA user_version = {int(target)}")
+        print(f"✅ Migration: schema version {current} → {target}")
+
+
+class ConnectionPool:
+
+
+    def __init__(self, database, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.database = database
+        self.size     = size
+        self.timeout  = timeout
+        self._idle    = queue.LifoQueue()
+        self._lock    = threading.Lock()
+        self._local   = threading.local()
+        self._created = 0
+
+        self.checkouts       = 0
+        self.waits           = 0
+        self.exhausted       = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max   = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=15.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL;')
+        conn.execute('PRAGMA synchronous=NORMAL;')
+        conn.execute('PRAGMA cache_size=-64000;')
+        conn.execute('PRAGMA temp_store=MEMORY;')
+        return conn
+
+    def _checkout(self):
+        start = time.monotonic()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self.waits += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.exhausted += 1
+                    raise sqlite3.OperationalError(
+                        f"connection pool exhausted ({self.size} connections busy for {self.timeout}s)"
+                    )
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self.checkouts       += 1
+            self.wait_time_total += waited
+            self.wait_time_max    = max(self.wait_time_max, waited)
+        return conn
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        
+        # Nested get_db_connection() calls on one thread share the outer checkout.
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size":        self.size,
+                "open":        self._created,
+                "idle":        self._idle.qsize(),
+                "checkouts":   self.checkouts,
+                "waits":       self.waits,
+                "exhausted":   self.exhausted,
+                "avg_wait_ms": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+
+_pool      = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.database != DATABASE:
+            _pool = ConnectionPool(DATABASE)
+        return _pool
 
 
 @contextmanager
 def get_db_connection():
     
-    conn = sqlite3.connect(DATABASE, timeout=15.0)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode=WAL;')
-    conn.execute('PRAGMA synchronous=NORMAL;')
-    conn.execute('PRAGMA cache_size=-64000;')
-    conn.execute('PRAGMA temp_store=MEMORY;')
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def get_read_connection():
+    
+    # For reads that last as long as a client download: a slow export must never hold one of
+    # the pool's slots, which the detection writer and every request share.
+    conn = get_pool()._connect()
+    conn.execute('PRAGMA query_only=ON;')
     try:
         yield conn
     finally:
         conn.close()
 
 
+def get_pool_stats():
+    
+    return get_pool().stats()
+
+
 def init_db():
     
     conn = sqlite3.connect(DATABASE)
@@ -52,6 +249,9 @@ def init_db():
             stream_url TEXT,
             rtsp_url TEXT,
             mqtt_topic TEXT,
+            preview_width INTEGER,
+            preview_height INTEGER,
+            target_fps REAL,
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
@@ -142,6 +342,7 @@ def init_db():
             detection_date DATE NOT NULL,
             weapon_type TEXT NOT NULL,
             total_detections INTEGER DEFAULT 0,
+            sum_confidence REAL DEFAULT 0.0,
             avg_confidence REAL DEFAULT 0.0,
             first_detection TIMESTAMP,
             last_detection TIMESTAMP,
@@ -152,11 +353,35 @@ def init_db():
     ''')
     
     
+    for table, _ in ROLLUPS.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                camera_id INTEGER NOT NULL,
+                bucket_start TEXT NOT NULL,
+                weapon_type TEXT NOT NULL,
+                total_detections INTEGER DEFAULT 0,
+                sum_confidence REAL DEFAULT 0.0,
+                avg_confidence REAL DEFAULT 0.0,
+                first_detection TIMESTAMP,
+                last_detection TIMESTAMP,
+                FOREIGN KEY (camera_id) REFERENCES cameras (id),
+                UNIQUE(bucket_start, camera_id, weapon_type)
+            )
+        ''')
+    
+    
     migrations = [
         ("detection_logs", "image_path",  "ALTER TABLE detection_logs ADD COLUMN image_path TEXT"),
         ("incidents",      "image_path",  "ALTER TABLE incidents ADD COLUMN image_path TEXT"),
         ("cameras",        "rtsp_url",    "ALTER TABLE cameras ADD COLUMN rtsp_url TEXT"),
         ("cameras",        "mqtt_topic",  "ALTER TABLE cameras ADD COLUMN mqtt_topic TEXT"),
+        ("cameras",        "preview_width",  "ALTER TABLE cameras ADD COLUMN preview_width INTEGER"),
+        ("cameras",        "preview_height", "ALTER TABLE cameras ADD COLUMN preview_height INTEGER"),
+        ("cameras",        "target_fps",     "ALTER TABLE cameras ADD COLUMN target_fps REAL"),
+        ("daily_summary",  "sum_confidence", "ALTER TABLE daily_summary ADD COLUMN sum_confidence REAL DEFAULT 0.0"),
+        ("detection_logs", "minute_of_day",  "ALTER TABLE detection_logs ADD COLUMN minute_of_day INTEGER"),
+        ("incidents",      "minute_of_day",  "ALTER TABLE incidents ADD COLUMN minute_of_day INTEGER"),
     ]
     for table, column, sql in migrations:
         try:
@@ -168,6 +393,8 @@ def init_db():
         except Exception as e:
             print(f"Note (migration): {e}")
 
+    apply_schema_migrations(cursor)
+
     
     cursor.execute('SELECT username FROM users WHERE username = ?', (DEFAULT_ADMIN['username'],))
     if not cursor.fetchone():
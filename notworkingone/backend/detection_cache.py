@@ -0,0 +1,180 @@
+import threading
+from datetime import datetime, timedelta
+from database import get_db_connection
+
+
+COOLDOWN_SECONDS = 60
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class DetectionCooldownCache:
+
+
+    def __init__(self, ttl_seconds=COOLDOWN_SECONDS):
+        self.ttl         = timedelta(seconds=ttl_seconds)
+        self._lock       = threading.Lock()
+        self._detections = {}
+        self._incidents  = {}
+        self._warmed     = False
+        self.hits        = 0
+        self.misses      = 0
+        self.rechecks    = 0
+        self.recheck_hits = 0
+        self.stale_incidents = 0
+
+    def warm(self):
+
+        since = datetime.now() - self.ttl
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, camera_id, weapon_type, detection_time, image_path FROM detection_logs
+                WHERE detection_time >= ?
+                ORDER BY detection_time
+            ''', (since,))
+            detections = cursor.fetchall()
+            cursor.execute('''
+                SELECT id, camera_id, weapon_type, detected_at FROM incidents
+                WHERE detected_at >= ? AND status IN ('pending', 'responding')
+                ORDER BY detected_at
+            ''', (since,))
+            incidents = cursor.fetchall()
+
+        with self._lock:
+            self._detections.clear()
+            self._incidents.clear()
+            for row in detections:
+                self._detections[(row['camera_id'], row['weapon_type'])] = (
+                    row['id'], _as_datetime(row['detection_time']), row['image_path']
+                )
+            for row in incidents:
+                self._incidents[(row['camera_id'], row['weapon_type'])] = (
+                    row['id'], _as_datetime(row['detected_at'])
+                )
+            self._warmed = True
+        print(f"🧊 Detection cache warmed: {len(detections)} recent detections, {len(incidents)} open incidents")
+
+    def _ensure_warm(self):
+        if not self._warmed:
+            self.warm()
+
+    def recent_detection(self, camera_id, weapon_type, now=None):
+
+        self._ensure_warm()
+        now = now or datetime.now()
+        key = (camera_id, weapon_type)
+        with self._lock:
+            entry = self._detections.get(key)
+            if entry and entry[1] >= now - self.ttl:
+                self.hits += 1
+                return {"detection_id": entry[0], "detection_time": entry[1], "image_path": entry[2]}
+            self._detections.pop(key, None)
+            self.misses += 1
+            return None
+
+    def record_detection(self, camera_id, weapon_type, detection_id, detection_time, image_path=None):
+        with self._lock:
+            self._detections[(camera_id, weapon_type)] = (detection_id, detection_time, image_path)
+
+    def attach_image(self, camera_id, weapon_type, detection_id, image_path):
+
+        with self._lock:
+            entry = self._detections.get((camera_id, weapon_type))
+            if entry and entry[0] == detection_id and not entry[2]:
+                self._detections[(camera_id, weapon_type)] = (detection_id, entry[1], image_path)
+
+    def forget_detection(self, camera_id, weapon_type, detection_id):
+
+        with self._lock:
+            entry = self._detections.get((camera_id, weapon_type))
+            if entry and entry[0] == detection_id:
+                del self._detections[(camera_id, weapon_type)]
+
+    def open_incident(self, camera_id, weapon_type, now=None):
+
+        self._ensure_warm()
+        now = now or datetime.now()
+        key = (camera_id, weapon_type)
+        with self._lock:
+            entry = self._incidents.get(key)
+            if entry and entry[1] >= now - self.ttl:
+                return entry[0]
+            self._incidents.pop(key, None)
+            return None
+
+    def record_incident(self, camera_id, weapon_type, incident_id, detected_at):
+        with self._lock:
+            self._incidents[(camera_id, weapon_type)] = (incident_id, _as_datetime(detected_at))
+
+    def forget_incident(self, incident_id):
+
+        with self._lock:
+            for key, entry in list(self._incidents.items()):
+                if entry[0] == incident_id:
+                    del self._incidents[key]
+
+    def recheck_detection(self, cursor, camera_id, weapon_type, now=None):
+
+        now = now or datetime.now()
+        cursor.execute('''
+            SELECT id, detection_time, image_path FROM detection_logs
+            WHERE camera_id = ? AND weapon_type = ? AND detection_time >= ?
+            ORDER BY detection_time DESC LIMIT 1
+        ''', (camera_id, weapon_type, now - self.ttl))
+        row = cursor.fetchone()
+        with self._lock:
+            self.rechecks += 1
+            if row is None:
+                return None
+            self.recheck_hits += 1
+            detection_time = _as_datetime(row['detection_time'])
+            self._detections[(camera_id, weapon_type)] = (row['id'], detection_time, row['image_path'])
+        return {"detection_id": row['id'], "detection_time": detection_time, "image_path": row['image_path']}
+
+    def recheck_incident(self, cursor, camera_id, weapon_type, now=None):
+
+        now = now or datetime.now()
+        cursor.execute('''
+            SELECT id, detected_at FROM incidents
+            WHERE camera_id = ? AND weapon_type = ? AND detected_at >= ? AND status IN ('pending', 'responding')
+            ORDER BY detected_at DESC LIMIT 1
+        ''', (camera_id, weapon_type, now - self.ttl))
+        row = cursor.fetchone()
+        with self._lock:
+            self.rechecks += 1
+            if row is None:
+                return None
+            self.recheck_hits += 1
+            self._incidents[(camera_id, weapon_type)] = (row['id'], _as_datetime(row['detected_at']))
+        return row['id']
+
+    def confirm_incident(self, cursor, incident_id):
+
+        # Resolving or deleting an incident only clears the cache of the process that did it.
+        cursor.execute("SELECT 1 FROM incidents WHERE id = ? AND status IN ('pending', 'responding')", (incident_id,))
+        if cursor.fetchone() is not None:
+            return True
+        self.forget_incident(incident_id)
+        with self._lock:
+            self.stale_incidents += 1
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits":       self.hits,
+                "misses":     self.misses,
+                "rechecks":   self.rechecks,
+                "recheck_hits": self.recheck_hits,
+                "stale_incidents": self.stale_incidents,
+                "detections": len(self._detections),
+                "incidents":  len(self._incidents),
+            }
+
+
+detection_cache = DetectionCooldownCache()
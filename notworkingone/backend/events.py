@@ -0,0 +1,81 @@
+import json
+import queue
+import threading
+from config import EVENT_SUBSCRIBER_QUEUE
+
+
+class Subscription:
+
+
+    def __init__(self, camera_ids=None, max_queue=EVENT_SUBSCRIBER_QUEUE):
+        self.camera_ids = set(camera_ids) if camera_ids else None
+        self.queue      = queue.Queue(maxsize=max_queue)
+        self.dropped    = 0
+
+    def wants(self, camera_id):
+        return self.camera_ids is None or camera_id in self.camera_ids
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock        = threading.Lock()
+        self.published    = 0
+        self.dropped      = 0
+
+    def subscribe(self, camera_ids=None):
+        sub = Subscription(camera_ids)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type, camera_id, payload):
+
+        message = (event_type, json.dumps(payload, default=str))
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.wants(camera_id)]
+            self.published += 1
+
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                # A stalled console loses its oldest event rather than blocking ingest.
+                try:
+                    sub.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    sub.queue.put_nowait(message)
+                except queue.Full:
+                    pass
+                sub.dropped += 1
+                with self._lock:
+                    self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published":   self.published,
+                "dropped":     self.dropped,
+            }
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {data}\n\n"
+
+
+event_bus = EventBus()
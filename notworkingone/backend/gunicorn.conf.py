@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+
+# Web workers only serve HTTP; run `SERVER_ROLE=ingest python app.py` alongside for cameras, MQTT and writes.
+raw_env = ["SERVER_ROLE=web"]
+
+bind    = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count())))
+
+# MJPEG and SSE viewers stay connected indefinitely; as greenlets they cost a few KB each instead of a thread.
+worker_class       = os.getenv("WEB_WORKER_CLASS", "gevent")
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", "1000"))
+timeout            = 60
+
+if worker_class == "gthread":
+    threads = int(os.getenv("WEB_THREADS", "50"))
@@ -0,0 +1,245 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import cv2
+import numpy as np
+from config import IMAGE_RETENTION_DAYS, IMAGE_SWEEP_INTERVAL, THUMBNAIL_SIZES, THUMBNAIL_JPEG_QUALITY
+
+
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'incident_images')
+
+
+def _write_atomic(filepath, data):
+
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".jpg")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Readers only ever see a missing file or a complete one.
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def variant_path(relpath, size):
+    base, ext = os.path.splitext(relpath)
+    return f"{base}.{size}{ext}"
+
+
+def original_path(relpath):
+    base, ext = os.path.splitext(relpath)
+    stem, _, size = base.rpartition('.')
+    return f"{stem}{ext}" if stem and size in THUMBNAIL_SIZES else relpath
+
+
+def _write_variant(relpath, size, image):
+
+    width = THUMBNAIL_SIZES[size]
+    h, w  = image.shape[:2]
+    if w > width:
+        image = cv2.resize(image, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+    ok, enc = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), THUMBNAIL_JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError(f"JPEG encode failed for {size} variant of {relpath}")
+    _write_atomic(os.path.join(IMAGES_DIR, variant_path(relpath, size)), enc.tobytes())
+
+
+def write_variants(relpath, image=None):
+
+    missing = [size for size in THUMBNAIL_SIZES
+               if not os.path.exists(os.path.join(IMAGES_DIR, variant_path(relpath, size)))]
+    if not missing:
+        return 0
+    if image is None:
+        with open(os.path.join(IMAGES_DIR, relpath), 'rb') as f:
+            image = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"{relpath} is not a decodable image")
+    for size in missing:
+        _write_variant(relpath, size, image)
+    return len(missing)
+
+
+def store_image(data, when=None, image=None):
+
+    when   = when or datetime.now()
+    digest = hashlib.sha256(data).hexdigest()
+    # Date first so retention can drop whole days; hash prefix keeps each day's directories small.
+    relpath  = f"{when:%Y/%m/%d}/{digest[:2]}/{digest}.jpg"
+    filepath = os.path.join(IMAGES_DIR, relpath)
+    if not os.path.exists(filepath):
+        try:
+            _write_atomic(filepath, data)
+        except FileNotFoundError:
+            # The sweeper pruned the empty shard directory between makedirs and the write.
+            _write_atomic(filepath, data)
+    try:
+        write_variants(relpath, image)
+    except Exception as e:
+        print(f"⚠️ Thumbnail generation failed for {relpath}: {e}")
+    return relpath
+
+
+def resolve_image(relpath):
+
+    relpath  = relpath.replace('incident_images/', '', 1) if relpath.startswith('incident_images/') else relpath
+    root     = os.path.realpath(IMAGES_DIR)
+    filepath = os.path.realpath(os.path.join(root, relpath))
+    if os.path.commonpath([root, filepath]) != root or not os.path.isfile(filepath):
+        return None
+    return filepath
+
+
+def resolve_variant(relpath, size):
+
+    filepath = resolve_image(relpath)
+    if filepath is None or size is None:
+        return filepath
+    relpath = os.path.relpath(filepath, os.path.realpath(IMAGES_DIR)).replace(os.sep, '/')
+    # Images stored before thumbnails existed get their variants on first request.
+    try:
+        write_variants(relpath)
+    except Exception as e:
+        print(f"⚠️ Thumbnail generation failed for {relpath}: {e}")
+        return filepath
+    return resolve_image(variant_path(relpath, size)) or filepath
+
+
+def delete_image(relpath):
+
+    filepath = resolve_image(relpath)
+    if filepath is None:
+        return False
+    for size in THUMBNAIL_SIZES:
+        variant = resolve_image(variant_path(relpath, size))
+        if variant is not None:
+            try:
+                os.remove(variant)
+            except OSError:
+                pass
+    try:
+        os.remove(filepath)
+        print(f"🗑️ Deleted image file: {filepath}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Failed to delete image file {filepath}: {e}")
+        return False
+
+
+def _iter_originals():
+    for dirpath, _, filenames in os.walk(IMAGES_DIR):
+        for name in filenames:
+            relpath = os.path.relpath(os.path.join(dirpath, name), IMAGES_DIR).replace(os.sep, '/')
+            if not name.startswith('.tmp-') and original_path(relpath) == relpath:
+                yield relpath
+
+
+def backfill_thumbnails():
+
+    images, written, failed = 0, 0, 0
+    for relpath in _iter_originals():
+        images += 1
+        try:
+            written += write_variants(relpath)
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ Thumbnail backfill failed for {relpath}: {e}")
+    return {"images": images, "written": written, "failed": failed}
+
+
+def _referenced_by_open_incidents():
+    from database import get_db_connection
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''SELECT DISTINCT image_path FROM incidents
+                          WHERE image_path IS NOT NULL AND status IN ('pending', 'responding')''')
+        return {row['image_path'] for row in cursor.fetchall()}
+
+
+def _clear_image_paths(tx, relpaths):
+    for relpath in relpaths:
+        tx.cursor.execute('UPDATE detection_logs SET image_path = NULL WHERE image_path = ?', (relpath,))
+        tx.cursor.execute('UPDATE incidents SET image_path = NULL WHERE image_path = ?', (relpath,))
+
+
+def sweep_images(retention_days, dry_run=False):
+
+    from ingest import detection_writer
+
+    cutoff  = time.time() - timedelta(days=retention_days).total_seconds()
+    keep    = _referenced_by_open_incidents()
+    removed  = []
+    variants = 0
+    freed    = 0
+    for dirpath, dirnames, filenames in os.walk(IMAGES_DIR, topdown=False):
+        gone = set()
+        # Originals first; a thumbnail follows its original out whatever its own mtime.
+        for name in sorted(filenames, key=lambda n: original_path(n) != n):
+            filepath = os.path.join(dirpath, name)
+            relpath  = os.path.relpath(filepath, IMAGES_DIR).replace(os.sep, '/')
+            original = original_path(relpath)
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            if original == relpath:
+                if st.st_mtime >= cutoff or relpath in keep:
+                    continue
+            elif original not in gone and os.path.exists(os.path.join(IMAGES_DIR, original)):
+                continue
+            if not dry_run:
+                try:
+                    os.remove(filepath)
+                except OSError as e:
+                    print(f"⚠️ Failed to delete image file {filepath}: {e}")
+                    continue
+            if original == relpath:
+                removed.append(relpath)
+                gone.add(relpath)
+            else:
+                variants += 1
+            freed += st.st_size
+        if not dry_run and dirpath != IMAGES_DIR and not os.listdir(dirpath):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    if removed and not dry_run:
+        for start in range(0, len(removed), 500):
+            detection_writer.run(_clear_image_paths, removed[start:start + 500])
+    return {"removed": len(removed), "variants": variants, "bytes": freed, "dry_run": dry_run}
+
+
+_sweeper_thread = None
+
+
+def start_image_sweeper(retention_days=IMAGE_RETENTION_DAYS, interval=IMAGE_SWEEP_INTERVAL):
+
+    global _sweeper_thread
+    if retention_days <= 0 or _sweeper_thread is not None:
+        return
+
+    def _loop():
+        while True:
+            try:
+                result = sweep_images(retention_days)
+                if result["removed"]:
+                    print(f"🧹 Image retention: removed {result['removed']} files ({result['bytes']} bytes)")
+            except Exception as e:
+                print(f"❌ Image sweep error: {e}")
+            time.sleep(interval)
+
+    _sweeper_thread = threading.Thread(target=_loop, name="image-sweeper", daemon=True)
+    _sweeper_thread.start()
+    print(f"🧹 Image retention sweeper started ({retention_days} days)")
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from database import get_db_connection
+from config import INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_SUBMIT_TIMEOUT
+
+
+class IngestBackpressure(Exception):
+    pass
+
+
+class WriteTransaction:
+
+
+    def __init__(self, cursor):
+        self.cursor       = cursor
+        self._on_commit   = []
+        self._on_rollback = []
+
+    def on_commit(self, fn):
+        self._on_commit.append(fn)
+
+    def on_rollback(self, fn):
+        self._on_rollback.append(fn)
+
+    def _run(self, callbacks):
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️  Ingest callback error: {e}")
+
+    def committed(self):
+        self._run(self._on_commit)
+
+    def rolled_back(self):
+        self._run(self._on_rollback)
+
+
+class _WriteOp:
+
+    __slots__ = ("fn", "args", "future", "enqueued_at")
+
+    def __init__(self, fn, args):
+        self.fn          = fn
+        self.args        = args
+        self.future      = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class DetectionWriter:
+
+
+    def __init__(self, max_queue=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue     = queue.Queue(maxsize=max_queue)
+        self._lock      = threading.Lock()
+        self._thread    = None
+        self._listeners = []
+
+        self.submitted     = 0
+        self.committed     = 0
+        self.failed        = 0
+        self.rejected      = 0
+        self.batches       = 0
+        self.latency_max   = 0.0
+        self.latency_total = 0.0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, timeout=INGEST_SUBMIT_TIMEOUT):
+
+        self._ensure_started()
+        op = _WriteOp(fn, args)
+        try:
+            self._queue.put(op, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise IngestBackpressure(f"detection ingest queue full ({self._queue.maxsize} pending)")
+        with self._lock:
+            self.submitted += 1
+        return op.future
+
+    def add_commit_listener(self, fn):
+        self._listeners.append(fn)
+
+    def run(self, fn, *args):
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("DetectionWriter.run() called from the writer thread; call the tx function directly")
+        return self.submit(fn, *args).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever piled up while the last batch was committing; never wait for more.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit_batch(batch)
+            except Exception as e:
+                print(f"❌ Detection writer error: {e}")
+                for op in batch:
+                    if not op.future.done():
+                        op.future.set_exception(e)
+
+    def _commit_batch(self, batch):
+        outcomes = []
+        try:
+            with get_db_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for op in batch:
+                    tx = WriteTransaction(conn.cursor())
+                    conn.execute("SAVEPOINT ingest_op")
+                    try:
+                        result = op.fn(tx, *op.args)
+                        conn.execute("RELEASE ingest_op")
+                        outcomes.append((op, tx, result, None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO ingest_op")
+                        conn.execute("RELEASE ingest_op")
+                        tx.rolled_back()
+                        outcomes.append((op, tx, None, e))
+                conn.commit()
+        except Exception as e:
+            for _, tx, _, error in outcomes:
+                if error is None:
+                    tx.rolled_back()
+            with self._lock:
+                self.failed += len(batch)
+            for op in batch:
+                op.future.set_exception(e)
+            return
+
+        for fn in self._listeners:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️  Ingest commit listener error: {e}")
+
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            for op, _, _, error in outcomes:
+                if error is None:
+                    self.committed += 1
+                else:
+                    self.failed += 1
+                latency = now - op.enqueued_at
+                self.latency_total += latency
+                self.latency_max    = max(self.latency_max, latency)
+
+        for op, tx, result, error in outcomes:
+            if error is None:
+                tx.committed()
+                op.future.set_result(result)
+            else:
+                op.future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            done = self.committed + self.failed
+            return {
+                "queued":         self._queue.qsize(),
+                "capacity":       self._queue.maxsize,
+                "submitted":      self.submitted,
+                "committed":      self.committed,
+                "failed":         self.failed,
+                "rejected":       self.rejected,
+                "batches":        self.batches,
+                "avg_batch_size": round(done / self.batches, 2) if self.batches else 0.0,
+                "avg_latency_ms": round(self.latency_total / done * 1000, 3) if done else 0.0,
+                "max_latency_ms": round(self.latency_max * 1000, 3),
+            }
+
+
+detection_writer = DetectionWriter()
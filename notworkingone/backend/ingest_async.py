@@ -0,0 +1,374 @@
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+
+import database
+from config import (
+    ASYNC_INGEST_QUEUE_SIZE, ASYNC_INGEST_INFLIGHT, ASYNC_INGEST_RETRY, ASYNC_INGEST_TOPIC_SYNC,
+    ASYNC_INGEST_STATS_INTERVAL, MQTT_HOST, MQTT_PORT, MQTT_TLS, MQTT_USERNAME, MQTT_PASSWORD,
+)
+
+try:
+    import aiomqtt
+except ImportError:
+    aiomqtt = None
+
+
+RawMessage = namedtuple("RawMessage", ["topic", "payload", "received_at"])
+Parsed     = namedtuple("Parsed", ["camera_id", "message", "received_at"])
+Detection  = namedtuple("Detection", ["camera_id", "weapon_type", "confidence", "received_at", "objects", "frame", "scale"])
+
+live_pipeline = None
+
+
+class AsyncIngestPipeline:
+
+
+    def __init__(self, resolve, queue_size=ASYNC_INGEST_QUEUE_SIZE, inflight=ASYNC_INGEST_INFLIGHT, publish=False):
+        self.resolve   = resolve
+        # Live ingest feeds the consoles like the paho path does; the benchmark leaves shared state alone.
+        self.publish   = publish
+        self.connected = False
+        # parse -> normalize -> cooldown -> persist; a full queue makes the stage before it wait.
+        self.raw        = asyncio.Queue(queue_size)
+        self.parsed     = asyncio.Queue(queue_size)
+        self.detections = asyncio.Queue(queue_size)
+        self.persist    = asyncio.Queue(queue_size)
+        self._inflight  = asyncio.Semaphore(inflight)
+        self._pending   = set()
+        self._tasks     = []
+        self.latencies  = deque(maxlen=100000)
+
+        self.counters = dict.fromkeys([
+            "received", "dropped", "unknown_topic", "bad_json", "no_threat",
+            "suppressed", "submitted", "new", "duplicate", "failed", "backpressure",
+        ], 0)
+
+    def offer(self, topic, payload):
+
+        self.counters["received"] += 1
+        try:
+            self.raw.put_nowait(RawMessage(topic, payload, time.monotonic()))
+            return True
+        except asyncio.QueueFull:
+            # Shed at the door: queued work keeps a bounded wait instead of every message getting slower.
+            self.counters["dropped"] += 1
+            return False
+
+    def start(self):
+        from models import get_system_user_id
+
+        self._user_id = get_system_user_id()
+        self._tasks = [
+            asyncio.create_task(self._parse_stage()),
+            asyncio.create_task(self._normalize_stage()),
+            asyncio.create_task(self._cooldown_stage()),
+            asyncio.create_task(self._persist_stage()),
+        ]
+
+    async def drain(self):
+
+        for q in (self.raw, self.parsed, self.detections, self.persist):
+            await q.join()
+        if self._pending:
+            await asyncio.wait(self._pending)
+
+    async def stop(self):
+        await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _parse_stage(self):
+        while True:
+            msg = await self.raw.get()
+            try:
+                camera_id = self.resolve(msg.topic)
+                if camera_id is None:
+                    self.counters["unknown_topic"] += 1
+                    continue
+                try:
+                    message = json.loads(msg.payload)
+                except (ValueError, UnicodeDecodeError):
+                    self.counters["bad_json"] += 1
+                    continue
+                await self.parsed.put(Parsed(camera_id, message, msg.received_at))
+            finally:
+                self.raw.task_done()
+
+    async def _normalize_stage(self):
+        from stream import normalize_objects, average_confidence, update_detection_state, snapshot_frame
+
+        while True:
+            item = await self.parsed.get()
+            try:
+                objects = normalize_objects(item.message)
+                if self.publish:
+                    update_detection_state(item.camera_id, item.message, objects)
+                if not item.message.get("detected") or not objects:
+                    self.counters["no_threat"] += 1
+                    continue
+                frame, scale = snapshot_frame(item.camera_id) if self.publish else (None, 1.0)
+                for weapon_type, data in objects.items():
+                    await self.detections.put(Detection(
+                        item.camera_id, weapon_type, average_confidence(data), item.received_at, objects, frame, scale
+                    ))
+            finally:
+                self.parsed.task_done()
+
+    async def _cooldown_stage(self):
+        from detection_cache import detection_cache
+
+        while True:
+            det = await self.detections.get()
+            try:
+                # Most messages during an event are repeats; drop them here, before they reach the writer queue.
+                if detection_cache.recent_detection(det.camera_id, det.weapon_type):
+                    self.counters["suppressed"] += 1
+                    continue
+                await self.persist.put(det)
+            finally:
+                self.detections.task_done()
+
+    async def _persist_stage(self):
+        from models import submit_detection
+        from ingest import IngestBackpressure
+
+        while True:
+            det = await self.persist.get()
+            try:
+                await self._inflight.acquire()
+                while True:
+                    try:
+                        future = submit_detection(
+                            self._user_id, det.camera_id, det.weapon_type, det.confidence, None,
+                            f"Automatic system incident for {det.weapon_type}", link_duplicates=False, timeout=0
+                        )
+                        break
+                    except IngestBackpressure:
+                        # Never block the loop on the writer's queue; yield and let the queues upstream absorb it.
+                        self.counters["backpressure"] += 1
+                        await asyncio.sleep(ASYNC_INGEST_RETRY)
+                    except Exception as e:
+                        # _await_commit never runs for this one, so the slot is ours to give back.
+                        future = None
+                        self._inflight.release()
+                        self.counters["failed"] += 1
+                        print(f"❌ Async ingest submit failed for camera {det.camera_id}: {e}")
+                        break
+                if future is None:
+                    continue
+                self.counters["submitted"] += 1
+                task = asyncio.create_task(self._await_commit(det, asyncio.wrap_future(future)))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+            finally:
+                self.persist.task_done()
+
+    async def _await_commit(self, det, future):
+        try:
+            result = await future
+            self.counters["new" if result["is_new"] else "duplicate"] += 1
+            self.latencies.append(time.monotonic() - det.received_at)
+            if self.publish and result["is_new"]:
+                await self._announce(det, result)
+        except Exception as e:
+            self.counters["failed"] += 1
+            print(f"❌ Async ingest persist failed for camera {det.camera_id}: {e}")
+        finally:
+            self._inflight.release()
+
+    async def _announce(self, det, result):
+        from stream import note_incident
+        from snapshots import snapshot_writer
+
+        if result.get("incident_id"):
+            # Looks the incident up in the database, so keep it off the loop.
+            await asyncio.to_thread(note_incident, det.camera_id, result["incident_id"])
+        if det.frame is not None:
+            # Same frame and objects for every weapon in a message, so siblings land on one stored image.
+            snapshot_writer.submit(det.camera_id, det.frame, det.scale, det.objects,
+                                   [(det.weapon_type, result["detection_id"])])
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "connected":  self.connected,
+            **self.counters,
+            "queued":     {"raw": self.raw.qsize(), "parsed": self.parsed.qsize(),
+                           "detections": self.detections.qsize(), "persist": self.persist.qsize()},
+            "inflight":   len(self._pending),
+            "latency_ms": {p: _percentile_ms(latencies, n) for p, n in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        }
+
+
+def _percentile_ms(values, pct):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000, 2)
+
+
+def _configured_topics():
+    import stream
+
+    with stream._config_lock:
+        return set(stream._topic_to_camera)
+
+
+async def _sync_topics(client, topics, subscribed):
+    from stream import _subscription
+
+    # Camera edits reload stream's topic map; follow it the way _sync_subscriptions does for paho.
+    while True:
+        wanted  = topics()
+        added   = sorted(wanted - subscribed)
+        removed = sorted(subscribed - wanted)
+        for topic in added:
+            await client.subscribe(_subscription(topic))
+        for topic in removed:
+            await client.unsubscribe(_subscription(topic))
+        subscribed.clear()
+        subscribed.update(wanted)
+        if added or removed:
+            print(f"📡 MQTT subscriptions: +{added} -{removed}")
+        await asyncio.sleep(ASYNC_INGEST_TOPIC_SYNC)
+
+
+async def mqtt_source(pipeline, topics):
+
+    from capture import backoff_delay
+
+    if aiomqtt is None:
+        raise RuntimeError("aiomqtt is not installed; pip install aiomqtt to run the async ingest against a broker")
+
+    failures = 0
+    while True:
+        try:
+            async with aiomqtt.Client(
+                MQTT_HOST, MQTT_PORT,
+                username=MQTT_USERNAME or None, password=MQTT_PASSWORD or None,
+                protocol=aiomqtt.ProtocolVersion.V5,
+                tls_context=ssl.create_default_context() if MQTT_TLS else None,
+                max_queued_incoming_messages=ASYNC_INGEST_QUEUE_SIZE,
+            ) as client:
+                failures = 0
+                pipeline.connected = True
+                print(f"✅ Async ingest connected to {MQTT_HOST}:{MQTT_PORT}")
+                sync = asyncio.create_task(_sync_topics(client, topics, set()))
+                try:
+                    async for message in client.messages:
+                        pipeline.offer(message.topic.value, message.payload)
+                finally:
+                    pipeline.connected = False
+                    sync.cancel()
+        except aiomqtt.MqttError as e:
+            failures += 1
+            delay = backoff_delay(failures)
+            print(f"⚠️  MQTT connection lost ({e}); reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def synthetic_source(pipeline, topics, count, rate, noise):
+
+    weapons = ["Gun", "pistol", "knife", "Heavy Weapon", "HEAVY_WEAPON"]
+    loop    = asyncio.get_running_loop()
+    start   = loop.time()
+    for n in range(count):
+        if random.random() < noise:
+            topic, payload = f"tenant/{n % 97}/telemetry", b'{"temp": 21.5}'
+        else:
+            topic   = random.choice(topics)
+            payload = json.dumps({
+                "detected": True,
+                "objects": {random.choice(weapons): {"confidences": [round(random.uniform(0.5, 1.0), 3)],
+                                                     "boxes": [[10, 10, 80, 120]]}},
+            }).encode()
+        pipeline.offer(topic, payload)
+        delay = start + (n + 1) / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run_live(interval):
+
+    from stream import _resolve_camera_id
+
+    global live_pipeline
+    live_pipeline = AsyncIngestPipeline(_resolve_camera_id, publish=True)
+    live_pipeline.start()
+    source = asyncio.create_task(mqtt_source(live_pipeline, _configured_topics))
+    while not source.done():
+        await asyncio.sleep(interval)
+        print(f"📊 Async ingest: {json.dumps(live_pipeline.stats())}")
+    source.result()
+
+
+def start_async_ingest():
+
+    # The app's MQTT consumer when INGEST_RUNTIME=async; app.py starts this instead of the paho client.
+    # Fail startup rather than serve with no consumer at all.
+    if aiomqtt is None:
+        raise RuntimeError("INGEST_RUNTIME=async needs aiomqtt; pip install -r requirements.txt")
+    threading.Thread(
+        target=asyncio.run, args=(run_live(ASYNC_INGEST_STATS_INTERVAL),), name="async-ingest", daemon=True
+    ).start()
+
+
+def live_stats():
+    pipeline = live_pipeline
+    if pipeline is None:
+        return {"runtime": "async", "connected": False}
+    return {"runtime": "async", **pipeline.stats()}
+
+
+async def run_benchmark(args):
+
+    from detection_cache import detection_cache
+    from ingest import detection_writer
+    from stream import _load_camera_config
+
+    detection_cache.ttl = timedelta(seconds=args.cooldown)
+    topic_map  = {f"bench/{row['id']}": row["id"] for row in _load_camera_config()}
+    pipeline   = AsyncIngestPipeline(topic_map.get)
+    pipeline.start()
+
+    t0 = time.perf_counter()
+    await synthetic_source(pipeline, list(topic_map), args.synthetic, args.rate, args.noise)
+    offered = time.perf_counter() - t0
+    await pipeline.stop()
+    elapsed = time.perf_counter() - t0
+
+    stats = pipeline.stats()
+    print(f"Offered {args.synthetic:,} messages in {offered:.2f}s (target {args.rate:,}/s), drained in {elapsed:.2f}s")
+    print(f"  dropped {stats['dropped']}, unknown topic {stats['unknown_topic']}, "
+          f"suppressed by cooldown {stats['suppressed']}, backpressure retries {stats['backpressure']}")
+    print(f"  persisted {stats['new']} new / {stats['duplicate']} duplicate, {stats['failed']} failed "
+          f"({(stats['new'] + stats['duplicate']) / elapsed:,.0f}/s)")
+    print(f"  receive→commit latency ms: {stats['latency_ms']}")
+    writer = detection_writer.stats()
+    print(f"  writer: {writer['batches']} batches, {writer['committed']} committed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asyncio MQTT ingest: parse → normalize → cooldown → persist.")
+    parser.add_argument("--synthetic", type=int, metavar="N", required=True, help="number of generated messages")
+    parser.add_argument("--rate", type=int, default=5000, help="synthetic messages per second")
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of synthetic messages on unknown topics")
+    parser.add_argument("--cooldown", type=float, default=60, help="cooldown seconds for the synthetic run (0 persists everything)")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DATABASE = args.db
+    database.init_db()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+
+BOUNDARY = b"--frame\r\n"
+
+
+def login(base_url, username, password):
+
+    req = urllib.request.Request(
+        f"{base_url}/login",
+        data=json.dumps({"username": username, "password": password}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req) as resp:
+        return json.load(resp)["access_token"]
+
+
+async def viewer(host, port, path, duration, results):
+
+    frames, received = 0, 0
+    tail  = b""
+    start = time.monotonic()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        results.append({"error": str(e)})
+        return
+
+    # HTTP/1.0 keeps the body unchunked, so multipart boundaries can be counted straight off the wire.
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        status = await reader.readline()
+        if b" 200 " not in status:
+            results.append({"error": status.decode(errors="replace").strip()})
+            return
+        deadline = start + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            received += len(chunk)
+            data      = tail + chunk
+            frames   += data.count(BOUNDARY)
+            tail      = data[-(len(BOUNDARY) - 1):]
+    except (OSError, asyncio.IncompleteReadError) as e:
+        results.append({"error": str(e)})
+        return
+    finally:
+        writer.close()
+
+    elapsed = time.monotonic() - start
+    results.append({"fps": frames / elapsed, "bytes": received, "seconds": elapsed})
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(args):
+
+    token = args.token or login(args.url, args.username, args.password)
+    parts = urlsplit(args.url)
+    path  = f"{parts.path.rstrip('/')}/video?camera_id={args.camera_id}&token={token}"
+
+    results = []
+    tasks   = []
+    for _ in range(args.connections):
+        tasks.append(asyncio.create_task(
+            viewer(parts.hostname, parts.port or 80, path, args.duration, results)
+        ))
+        # Ramp up instead of opening every socket in the same tick.
+        await asyncio.sleep(args.ramp / args.connections)
+    await asyncio.gather(*tasks)
+
+    errors = [r["error"] for r in results if "error" in r]
+    fps    = sorted(r["fps"] for r in results if "fps" in r)
+    total  = sum(r.get("bytes", 0) for r in results)
+
+    print(f"Viewers: {len(fps)} streamed, {len(errors)} failed (camera {args.camera_id}, {args.duration}s)")
+    if errors:
+        print(f"  first error: {errors[0]}")
+    if fps:
+        print(f"  per-viewer fps: min {fps[0]:.1f}  p5 {percentile(fps, 5):.1f}  "
+              f"median {percentile(fps, 50):.1f}  max {fps[-1]:.1f}")
+        print(f"  aggregate: {sum(fps):.0f} frames/s, {total / args.duration / 1e6:.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open many concurrent MJPEG viewers and report per-viewer frame rate.")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--camera-id", type=int, default=1)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which to open the connections")
+    parser.add_argument("--token")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="SecureAdmin@2024!")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
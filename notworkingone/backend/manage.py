@@ -0,0 +1,57 @@
+import argparse
+from database import init_db
+
+
+def rebuild_summary(args):
+    from models import rebuild_daily_summary
+    rows = rebuild_daily_summary()
+    print(f"✅ Rebuilt daily_summary ({rows} rows) and rollup tables")
+
+
+def sweep_images(args):
+    from image_store import sweep_images as sweep
+    from config import IMAGE_RETENTION_DAYS
+    days = args.days or IMAGE_RETENTION_DAYS
+    if days <= 0:
+        print("❌ Pass --days or set IMAGE_RETENTION_DAYS")
+        return
+    result = sweep(days, dry_run=args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"🧹 {verb} {result['removed']} images older than {days} days ({result['bytes']} bytes)")
+
+
+def backfill_thumbnails(args):
+    from image_store import backfill_thumbnails as backfill
+    result = backfill()
+    print(f"✅ Checked {result['images']} images, wrote {result['written']} thumbnails, {result['failed']} failed")
+
+
+COMMANDS = {
+    "rebuild-summary": (rebuild_summary, "Regenerate daily_summary and the hourly/weekly/monthly rollups from detection_logs"),
+    "sweep-images": (sweep_images, "Delete incident images past the retention window"),
+    "backfill-thumbnails": (backfill_thumbnails, "Generate small/medium variants for stored incident images"),
+}
+
+ARGUMENTS = {
+    "sweep-images": [
+        (("--days",), {"type": int, "help": "Retention in days (default: IMAGE_RETENTION_DAYS)"}),
+        (("--dry-run",), {"action": "store_true", "help": "Report what would be removed"}),
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weapon detection backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        for flags, options in ARGUMENTS.get(name, []):
+            sub.add_argument(*flags, **options)
+    args = parser.parse_args()
+
+    init_db()
+    COMMANDS[args.command][0](args)
+
+
+if __name__ == "__main__":
+    main()
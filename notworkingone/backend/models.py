@@ -1,7 +1,13 @@
 import sqlite3
-from datetime import datetime, date
-from database import get_db_connection
-from config import pwd_ctx, DEFAULT_WEAPONS
+from datetime import datetime, date, timedelta
+from database import get_db_connection, get_read_connection, ROLLUPS, rollup_rebuild_sql
+from concurrent.futures import Future
+from config import pwd_ctx, DEFAULT_WEAPONS, EXPORT_BATCH_SIZE, DEDUP_RECHECK, INGEST_SUBMIT_TIMEOUT, SERVER_ROLE
+from detection_cache import detection_cache
+from ingest import detection_writer
+from image_store import delete_image
+from dashboard_cache import dashboard_cache
+from statebus import state_bus_client
 
 
 def dict_from_row(row):
@@ -63,22 +69,42 @@ def create_user(data):
             return False
 
 
+def _delete_user_tx(cursor, user_id):
+    
+    # Rollups aren't split by user; only the buckets this user contributed to need recounting.
+    affected = {}
+    for table, bucket in ROLLUPS.values():
+        cursor.execute(f'''SELECT DISTINCT camera_id, weapon_type, {bucket.format(ts='detection_time')}
+                          FROM detection_logs WHERE user_id = ?''', (user_id,))
+        affected[table] = [tuple(row) for row in cursor.fetchall()]
+    
+    cursor.execute('DELETE FROM weapon_preferences WHERE user_id = ?', (user_id,))
+    cursor.execute('DELETE FROM detection_logs WHERE user_id = ?', (user_id,))
+    cursor.execute('DELETE FROM daily_summary WHERE user_id = ?', (user_id,))
+    cursor.execute('DELETE FROM incident_actions WHERE user_id = ?', (user_id,))
+    cursor.execute('UPDATE incidents SET assigned_to = NULL WHERE assigned_to = ?', (user_id,))
+    cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+    deleted = cursor.rowcount > 0
+    
+    for table, bucket in ROLLUPS.values():
+        keys = affected[table]
+        if not keys:
+            continue
+        cursor.executemany(f'DELETE FROM {table} WHERE camera_id = ? AND weapon_type = ? AND bucket_start = ?', keys)
+        cursor.executemany(rollup_rebuild_sql(
+            table, bucket, where=f"camera_id = ? AND weapon_type = ? AND {bucket.format(ts='detection_time')} = ?"
+        ), keys)
+    return deleted
+
+
 def delete_user(username):
     
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        user = get_user_by_username(username)
-        if user:
-            user_id = user['id']
-            cursor.execute('DELETE FROM weapon_preferences WHERE user_id = ?', (user_id,))
-            cursor.execute('DELETE FROM detection_logs WHERE user_id = ?', (user_id,))
-            cursor.execute('DELETE FROM daily_summary WHERE user_id = ?', (user_id,))
-            cursor.execute('DELETE FROM incident_actions WHERE user_id = ?', (user_id,))
-            cursor.execute('UPDATE incidents SET assigned_to = NULL WHERE assigned_to = ?', (user_id,))
-            cursor.execute('DELETE FROM users WHERE username = ?', (username,))
-            conn.commit()
-            return cursor.rowcount > 0
+    if SERVER_ROLE == "web":
+        return state_bus_client.call("delete_user", username)
+    user = get_user_by_username(username)
+    if not user:
         return False
+    return detection_writer.run(lambda tx: _delete_user_tx(tx.cursor, user['id']))
 
 
 def update_password(username, new_password):
@@ -105,117 +131,242 @@ def update_user_profile(username, first_name, last_name, phone, badge_number, de
         return cursor.rowcount > 0
 
 
+def _insert_detection(cursor, user_id, camera_id, weapon_type, confidence_score=0.85, image_path=None, now=None):
+    
+    now = now or datetime.now()
+    today = now.date()
+    
+    cursor.execute('''INSERT INTO detection_logs 
+                     (user_id, camera_id, weapon_type, confidence_score, detection_time, date_only, image_path,
+                      minute_of_day) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                  (user_id, camera_id, weapon_type, confidence_score, now, today, image_path,
+                   now.hour * 60 + now.minute))
+    
+    detection_id = cursor.lastrowid
+    
+    confidence = confidence_score or 0.0
+    cursor.execute('''INSERT INTO daily_summary 
+                     (user_id, camera_id, detection_date, weapon_type, total_detections, 
+                      sum_confidence, avg_confidence, first_detection, last_detection)
+                     VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                     ON CONFLICT (user_id, camera_id, detection_date, weapon_type) DO UPDATE SET
+                         total_detections = total_detections + 1,
+                         sum_confidence   = sum_confidence + excluded.sum_confidence,
+                         avg_confidence   = (sum_confidence + excluded.sum_confidence) / (total_detections + 1),
+                         first_detection  = COALESCE(MIN(first_detection, excluded.first_detection), excluded.first_detection),
+                         last_detection   = COALESCE(MAX(last_detection, excluded.last_detection), excluded.last_detection)''',
+                  (user_id, camera_id, today, weapon_type, confidence, confidence, now, now))
+    
+    for table, bucket in ROLLUPS.values():
+        cursor.execute(f'''INSERT INTO {table} 
+                          (camera_id, bucket_start, weapon_type, total_detections, 
+                           sum_confidence, avg_confidence, first_detection, last_detection)
+                          VALUES (?, {bucket.format(ts='?')}, ?, 1, ?, ?, ?, ?)
+                          ON CONFLICT (bucket_start, camera_id, weapon_type) DO UPDATE SET
+                              total_detections = total_detections + 1,
+                              sum_confidence   = sum_confidence + excluded.sum_confidence,
+                              avg_confidence   = (sum_confidence + excluded.sum_confidence) / (total_detections + 1),
+                              first_detection  = COALESCE(MIN(first_detection, excluded.first_detection), excluded.first_detection),
+                              last_detection   = COALESCE(MAX(last_detection, excluded.last_detection), excluded.last_detection)''',
+                       (camera_id, now, weapon_type, confidence, confidence, now, now))
+    
+    return detection_id
+
+
+def _rebuild_rollups(cursor):
+    
+    for table, bucket in ROLLUPS.values():
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(rollup_rebuild_sql(table, bucket))
+
+
 def log_detection(user_id, camera_id, weapon_type, confidence_score=0.85, image_path=None):
     
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        now = datetime.now()
-        today = date.today()
-        
-        cursor.execute('''INSERT INTO detection_logs 
-                         (user_id, camera_id, weapon_type, confidence_score, detection_time, date_only, image_path) 
-                         VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                      (user_id, camera_id, weapon_type, confidence_score, now, today, image_path))
-        
-        detection_id = cursor.lastrowid
-        
-        cursor.execute('''INSERT OR REPLACE INTO daily_summary 
-                         (user_id, camera_id, detection_date, weapon_type, total_detections, 
-                          avg_confidence, first_detection, last_detection)
-                         SELECT ?, ?, ?, ?, 
-                                COALESCE((SELECT total_detections FROM daily_summary 
-                                         WHERE user_id = ? AND camera_id = ? AND detection_date = ? AND weapon_type = ?), 0) + 1,
-                                (SELECT AVG(confidence_score) FROM detection_logs 
-                                 WHERE user_id = ? AND camera_id = ? AND date_only = ? AND weapon_type = ?),
-                                COALESCE((SELECT first_detection FROM daily_summary 
-                                         WHERE user_id = ? AND camera_id = ? AND detection_date = ? AND weapon_type = ?), ?),
-                                ?''',
-                      (user_id, camera_id, today, weapon_type,
-                       user_id, camera_id, today, weapon_type,
-                       user_id, camera_id, today, weapon_type,
-                       user_id, camera_id, today, weapon_type, now,
-                       now))
-        
-        conn.commit()
-        return detection_id
+    return detection_writer.run(
+        lambda tx: _insert_detection(tx.cursor, user_id, camera_id, weapon_type, confidence_score, image_path)
+    )
+
+
+def _rebuild_daily_summary_tx(cursor):
+    
+    cursor.execute('DELETE FROM daily_summary')
+    cursor.execute('''INSERT INTO daily_summary 
+                     (user_id, camera_id, detection_date, weapon_type, total_detections, 
+                      sum_confidence, avg_confidence, first_detection, last_detection)
+                     SELECT user_id, camera_id, date_only, weapon_type, COUNT(*),
+                            COALESCE(SUM(confidence_score), 0), COALESCE(SUM(confidence_score), 0) / COUNT(*),
+                            MIN(detection_time), MAX(detection_time)
+                     FROM detection_logs
+                     GROUP BY user_id, camera_id, date_only, weapon_type''')
+    rows = cursor.rowcount
+    _rebuild_rollups(cursor)
+    return rows
+
+
+def rebuild_daily_summary():
+    
+    # Through the writer so the full recount queues behind ingest instead of contending for the write lock.
+    return detection_writer.run(lambda tx: _rebuild_daily_summary_tx(tx.cursor))
+
+
+def _insert_incident(cursor, camera_id, weapon_type, detection_id, created_by, location, description='', image_path=None):
+    
+    cursor.execute('SELECT detection_time, image_path, minute_of_day FROM detection_logs WHERE id = ?', (detection_id,))
+    row = cursor.fetchone()
+    detected_at = row['detection_time'] if row else datetime.now()
+    minute_of_day = row['minute_of_day'] if row else detected_at.hour * 60 + detected_at.minute
+    
+    if not image_path and row and row['image_path']:
+        image_path = row['image_path']
+    
+    import random
+    now = datetime.now()
+    unique_suffix = now.strftime('%f')[:4]  
+    for attempt in range(5):
+        incident_number = f"INC-{now.strftime('%Y%m%d-%H%M%S')}-{unique_suffix}"
+        try:
+            cursor.execute('''INSERT INTO incidents 
+                             (incident_number, camera_id, weapon_type, detection_id, created_by, 
+                              detected_at, location, description, status, priority, image_path, minute_of_day) 
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', 'high', ?, ?)''',
+                          (incident_number, camera_id, weapon_type, detection_id, created_by, 
+                           detected_at, location, description, image_path, minute_of_day))
+            break
+        except sqlite3.IntegrityError:
+            # Batched writes can create several incidents within the same 100 µs suffix window.
+            if attempt == 4:
+                raise
+            unique_suffix = f"{random.randint(0, 9999):04d}"
+    
+    incident_id = cursor.lastrowid
+    
+    cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', 
+                  (incident_id, detection_id))
+    
+    cursor.execute('''INSERT INTO incident_actions 
+                     (incident_id, user_id, action_type, notes) 
+                     VALUES (?, ?, 'created', 'Incident created from weapon detection')''',
+                  (incident_id, created_by))
+    
+    return incident_id
 
 
 def create_incident(camera_id, weapon_type, detection_id, created_by, location, description='', image_path=None):
     
-    with get_db_connection() as conn:
+    if SERVER_ROLE == "web":
+        return state_bus_client.call("create_incident", camera_id, weapon_type, detection_id, created_by,
+                                     location, description, image_path)
+    return detection_writer.run(
+        lambda tx: _insert_incident(tx.cursor, camera_id, weapon_type, detection_id, created_by,
+                                    location, description, image_path)
+    )
+
+
+def _minute_window(column, time_window):
+    
+    start, end = time_window or (None, None)
+    if start is not None and end is not None:
+        if start <= end:
+            return f' AND {column} BETWEEN ? AND ?', [start, end]
+        # Overnight windows such as 22:00-06:00 wrap past midnight.
+        return f' AND ({column} >= ? OR {column} <= ?)', [start, end]
+    if start is not None:
+        return f' AND {column} >= ?', [start]
+    if end is not None:
+        return f' AND {column} <= ?', [end]
+    return '', []
+
+
+def _incident_filters(status=None, assigned_to=None, officer_view=False, time_window=None):
+    
+    query, params = _minute_window('i.minute_of_day', time_window)
+    
+    if officer_view and assigned_to:
+        query += ' AND (i.assigned_to = ? OR i.assigned_to IS NULL)'
+        params.append(assigned_to)
+    elif not officer_view and assigned_to:
+        query += ' AND i.assigned_to = ?'
+        params.append(assigned_to)
+    
+    if status:
+        query += ' AND i.status = ?'
+        params.append(status)
+    
+    return query, params
+
+
+INCIDENT_LIST_QUERY = '''
+    SELECT i.*, c.camera_name, c.location as camera_location,
+           u1.username as created_by_username,
+           u2.username as assigned_to_username,
+           u3.username as resolved_by_username
+    FROM incidents i
+    JOIN cameras c ON i.camera_id = c.id
+    JOIN users u1 ON i.created_by = u1.id
+    LEFT JOIN users u2 ON i.assigned_to = u2.id
+    LEFT JOIN users u3 ON i.resolved_by = u3.id
+    WHERE 1=1
+'''
+
+
+def _stream_query(query, params, batch_size):
+    
+    # First item is the column list, then fetchmany() batches; memory stays at one batch.
+    with get_read_connection() as conn:
         cursor = conn.cursor()
-        
-        cursor.execute('SELECT detection_time, image_path FROM detection_logs WHERE id = ?', (detection_id,))
-        row = cursor.fetchone()
-        detected_at = row['detection_time'] if row else datetime.now()
-        
-        if not image_path and row and row['image_path']:
-            image_path = row['image_path']
-        
-        now = datetime.now()
-        import random
-        unique_suffix = now.strftime('%f')[:4]  
-        incident_number = f"INC-{now.strftime('%Y%m%d-%H%M%S')}-{unique_suffix}"
-        
-        cursor.execute('''INSERT INTO incidents 
-                         (incident_number, camera_id, weapon_type, detection_id, created_by, 
-                          detected_at, location, description, status, priority, image_path) 
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', 'high', ?)''',
-                      (incident_number, camera_id, weapon_type, detection_id, created_by, 
-                       detected_at, location, description, image_path))
-        
-        incident_id = cursor.lastrowid
-        
-        cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', 
-                      (incident_id, detection_id))
-        
-        cursor.execute('''INSERT INTO incident_actions 
-                         (incident_id, user_id, action_type, notes) 
-                         VALUES (?, ?, 'created', 'Incident created from weapon detection')''',
-                      (incident_id, created_by))
-        
-        conn.commit()
-        return incident_id
+        cursor.execute(query, params)
+        yield [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
 
 
-def get_incidents(status=None, assigned_to=None, limit=100, officer_view=False):
+def get_incidents(status=None, assigned_to=None, limit=100, officer_view=False, before=None, time_window=None):
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        query = '''
-            SELECT i.*, c.camera_name, c.location as camera_location,
-                   u1.username as created_by_username,
-                   u2.username as assigned_to_username,
-                   u3.username as resolved_by_username
-            FROM incidents i
-            JOIN cameras c ON i.camera_id = c.id
-            JOIN users u1 ON i.created_by = u1.id
-            LEFT JOIN users u2 ON i.assigned_to = u2.id
-            LEFT JOIN users u3 ON i.resolved_by = u3.id
-            WHERE 1=1
-        '''
-        
-        params = []
+        query = INCIDENT_LIST_QUERY
         
-        if officer_view and assigned_to:
-            query += ' AND (i.assigned_to = ? OR i.assigned_to IS NULL)'
-            params.append(assigned_to)
-        elif not officer_view and assigned_to:
-            query += ' AND i.assigned_to = ?'
-            params.append(assigned_to)
+        filters, params = _incident_filters(status, assigned_to, officer_view, time_window)
+        query += filters
         
-        if status:
-            query += ' AND i.status = ?'
-            params.append(status)
+        if before:
+            query += ' AND (i.detected_at < ? OR (i.detected_at = ? AND i.id < ?))'
+            params.extend([before[0], before[0], before[1]])
         
-        query += ' ORDER BY i.detected_at DESC LIMIT ?'
+        query += ' ORDER BY i.detected_at DESC, i.id DESC LIMIT ?'
         params.append(limit)
         
         cursor.execute(query, params)
         return cursor.fetchall()
 
 
+def count_incidents(status=None, assigned_to=None, officer_view=False, cap=None, time_window=None):
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        filters, params = _incident_filters(status, assigned_to, officer_view, time_window)
+        query = f'SELECT 1 FROM incidents i WHERE 1=1{filters}'
+        if cap:
+            query += ' LIMIT ?'
+            params.append(cap)
+        
+        cursor.execute(f'SELECT COUNT(*) FROM ({query})', params)
+        return cursor.fetchone()[0]
+
+
+def stream_incidents(status=None, assigned_to=None, officer_view=False, time_window=None, batch_size=EXPORT_BATCH_SIZE):
+    
+    filters, params = _incident_filters(status, assigned_to, officer_view, time_window)
+    query = INCIDENT_LIST_QUERY + filters + ' ORDER BY i.detected_at DESC, i.id DESC'
+    return _stream_query(query, params, batch_size)
+
+
 def get_incident_by_id(incident_id):
     
     with get_db_connection() as conn:
@@ -285,6 +436,8 @@ def update_incident(incident_id, user_id, updates):
                        updates.get('response_notes') or updates.get('resolution_notes') or 'Incident updated'))
         
         conn.commit()
+        if updates.get('status') not in (None, 'pending', 'responding'):
+            detection_cache.forget_incident(incident_id)
         return cursor.rowcount > 0
 
 
@@ -304,25 +457,27 @@ def get_incident_actions(incident_id):
 
 def delete_incident(incident_id):
     
-    import os
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
         
-        cursor.execute('SELECT image_path FROM incidents WHERE id = ?', (incident_id,))
+        cursor.execute('SELECT image_path, detection_id FROM incidents WHERE id = ?', (incident_id,))
         incident = cursor.fetchone()
         
         
+        shared = False
         if incident and incident['image_path']:
-            image_path = incident['image_path']
-            IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'incident_images')
-            filepath = os.path.join(IMAGES_DIR, image_path)
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                    print(f"🗑️ Deleted image file: {filepath}")
-                except Exception as e:
-                    print(f"⚠️ Failed to delete image file {filepath}: {e}")
+            # Snapshots are shared by every weapon in a message and deduplicated by content.
+            # Sibling detections from the same message (e.g. a knife below the incident threshold) count too.
+            cursor.execute('''SELECT 1 FROM incidents WHERE image_path = ? AND id != ?
+                              UNION ALL
+                              SELECT 1 FROM detection_logs WHERE image_path = ? AND id IS NOT ?
+                              LIMIT 1''',
+                           (incident['image_path'], incident_id, incident['image_path'], incident['detection_id']))
+            shared = cursor.fetchone() is not None
+        
+        if incident and incident['image_path'] and not shared:
+            delete_image(incident['image_path'])
                     
         
         cursor.execute('UPDATE detection_logs SET incident_id = NULL WHERE incident_id = ?', (incident_id,))
@@ -334,6 +489,8 @@ def delete_incident(incident_id):
         cursor.execute('DELETE FROM incidents WHERE id = ?', (incident_id,))
         
         conn.commit()
+        detection_cache.forget_incident(incident_id)
+        dashboard_cache.invalidate()
         return cursor.rowcount > 0
 
 
@@ -393,37 +550,79 @@ def get_cameras_list():
         return cursor.fetchall()
 
 
-def get_detection_logs(camera_id=None, weapon_type=None, days=7, limit=100):
+def _detection_log_filters(camera_id=None, weapon_type=None, days=7, time_window=None):
+    
+    query = " AND dl.date_only >= date('now', ?)"
+    params = [f'-{int(days)} days']
+    
+    window, window_params = _minute_window('dl.minute_of_day', time_window)
+    query += window
+    params.extend(window_params)
+    
+    if camera_id:
+        query += ' AND dl.camera_id = ?'
+        params.append(camera_id)
+    
+    if weapon_type:
+        query += ' AND dl.weapon_type = ?'
+        params.append(weapon_type)
+    
+    return query, params
+
+
+DETECTION_LOG_LIST_QUERY = '''
+    SELECT dl.*, c.camera_name, c.location, u.username, i.incident_number, i.status as incident_status
+    FROM detection_logs dl
+    JOIN cameras c ON dl.camera_id = c.id
+    JOIN users u ON dl.user_id = u.id
+    LEFT JOIN incidents i ON dl.incident_id = i.id
+    WHERE 1=1
+'''
+
+
+def get_detection_logs(camera_id=None, weapon_type=None, days=7, limit=100, before=None, time_window=None):
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        query = '''
-            SELECT dl.*, c.camera_name, c.location, u.username, i.incident_number, i.status as incident_status
-            FROM detection_logs dl
-            JOIN cameras c ON dl.camera_id = c.id
-            JOIN users u ON dl.user_id = u.id
-            LEFT JOIN incidents i ON dl.incident_id = i.id
-            WHERE dl.date_only >= date('now', '-{} days')
-        '''.format(days)
-        
-        params = []
+        query = DETECTION_LOG_LIST_QUERY
         
-        if camera_id:
-            query += ' AND dl.camera_id = ?'
-            params.append(camera_id)
+        filters, params = _detection_log_filters(camera_id, weapon_type, days, time_window)
+        query += filters
         
-        if weapon_type:
-            query += ' AND dl.weapon_type = ?'
-            params.append(weapon_type)
+        if before:
+            query += ' AND (dl.detection_time < ? OR (dl.detection_time = ? AND dl.id < ?))'
+            params.extend([before[0], before[0], before[1]])
         
-        query += ' ORDER BY dl.detection_time DESC LIMIT ?'
+        query += ' ORDER BY dl.detection_time DESC, dl.id DESC LIMIT ?'
         params.append(limit)
         
         cursor.execute(query, params)
         return cursor.fetchall()
 
 
+def count_detection_logs(camera_id=None, weapon_type=None, days=7, cap=None, time_window=None):
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        filters, params = _detection_log_filters(camera_id, weapon_type, days, time_window)
+        query = f'SELECT 1 FROM detection_logs dl WHERE 1=1{filters}'
+        if cap:
+            query += ' LIMIT ?'
+            params.append(cap)
+        
+        cursor.execute(f'SELECT COUNT(*) FROM ({query})', params)
+        return cursor.fetchone()[0]
+
+
+def stream_detection_logs(camera_id=None, weapon_type=None, days=7, time_window=None, batch_size=EXPORT_BATCH_SIZE):
+    
+    filters, params = _detection_log_filters(camera_id, weapon_type, days, time_window)
+    query = DETECTION_LOG_LIST_QUERY + filters + ' ORDER BY dl.detection_time DESC, dl.id DESC'
+    return _stream_query(query, params, batch_size)
+
+
 def get_dashboard_data(user_id, days=7, camera_id=None):
     
     with get_db_connection() as conn:
@@ -490,83 +689,206 @@ def get_dashboard_data(user_id, days=7, camera_id=None):
         }
 
 
-import threading
-_detection_cooldown_lock = threading.Lock()
+ANALYTICS_RESOLUTIONS = [
+    ("hour",  3600),
+    ("day",   86400),
+    ("week",  7 * 86400),
+    ("month", 31 * 86400),
+]
+
 
-def process_system_detection(camera_id, weapon_type, confidence_score, image_bytes=None):
+def pick_resolution(days, max_points):
     
-    from datetime import datetime, timedelta
-    import os
+    span = days * 86400
+    for resolution, seconds in ANALYTICS_RESOLUTIONS:
+        # +1 for the partial bucket at the start of the range.
+        if -(-span // seconds) + 1 <= max_points:
+            return resolution
+    return ANALYTICS_RESOLUTIONS[-1][0]
+
+
+def get_analytics(days=30, camera_id=None, weapon_type=None, max_points=60):
+    
+    resolution = pick_resolution(days, max_points)
+    since = datetime.now() - timedelta(days=days)
+    
+    if resolution == "day":
+        query = '''SELECT detection_date as bucket_start, weapon_type,
+                          SUM(total_detections) as total,
+                          SUM(sum_confidence) / SUM(total_detections) as avg_confidence
+                   FROM daily_summary WHERE detection_date >= ?'''
+        params = [since.date()]
+    else:
+        table, bucket = ROLLUPS[resolution]
+        query = f'''SELECT bucket_start, weapon_type,
+                           SUM(total_detections) as total,
+                           SUM(sum_confidence) / SUM(total_detections) as avg_confidence
+                    FROM {table} WHERE bucket_start >= {bucket.format(ts='?')}'''
+        params = [since]
+    
+    if camera_id:
+        query += ' AND camera_id = ?'
+        params.append(camera_id)
+    
+    if weapon_type:
+        query += ' AND weapon_type = ?'
+        params.append(weapon_type)
+    
+    query += ' GROUP BY 1, 2 ORDER BY 1, 2'
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return {
+            "resolution": resolution,
+            "since": since.isoformat(),
+            "buckets": [dict(row) for row in cursor.fetchall()]
+        }
+
+
+_system_user_id = None
+
+
+def get_system_user_id():
+    
+    global _system_user_id
     from config import SYSTEM_USER
+    if _system_user_id is None:
+        user = get_user_by_username(SYSTEM_USER['username'])
+        if not user:
+            return 1
+        _system_user_id = user['id']
+    return _system_user_id
+
+
+def _record_detection_tx(tx, user_id, camera_id, weapon_type, confidence_score, image_path, description, link_duplicates):
+    
+    cursor = tx.cursor
+    key_detection = detection_cache.recent_detection(camera_id, weapon_type)
+    if key_detection is None and DEDUP_RECHECK:
+        # Another node may have logged it. The writer holds BEGIN IMMEDIATE, so no node can insert between this check and ours.
+        key_detection = detection_cache.recheck_detection(cursor, camera_id, weapon_type)
+    
+    if key_detection:
+        if not link_duplicates:
+            return {"detection_id": key_detection['detection_id'], "incident_id": None,
+                    "image_path": key_detection['image_path'], "is_new": False, "is_new_incident": False}
+        detection_id = key_detection['detection_id']
+        detected_at = key_detection['detection_time']
+        image_path = key_detection['image_path']
+        is_new = False
+    else:
+        detected_at = datetime.now()
+        detection_id = _insert_detection(cursor, user_id, camera_id, weapon_type, confidence_score, image_path, detected_at)
+        # Update the cache inside the transaction so later ops in the same batch see this detection.
+        detection_cache.record_detection(camera_id, weapon_type, detection_id, detected_at, image_path)
+        tx.on_rollback(lambda: detection_cache.forget_detection(camera_id, weapon_type, detection_id))
+        is_new = True
+    
+    incident_id = None
+    is_new_incident = False
+    if confidence_score >= 0.80:
+        incident_id = detection_cache.open_incident(camera_id, weapon_type)
+        if incident_id and DEDUP_RECHECK and not detection_cache.confirm_incident(cursor, incident_id):
+            # Another process resolved or deleted it; fall through to the database lookup.
+            incident_id = None
+        if incident_id is None and DEDUP_RECHECK:
+            incident_id = detection_cache.recheck_incident(cursor, camera_id, weapon_type)
+        if incident_id:
+            cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', (incident_id, detection_id))
+        else:
+            location = get_camera_location(camera_id)
+            incident_id = _insert_incident(cursor, camera_id, weapon_type, detection_id, user_id, location, description, image_path)
+            detection_cache.record_incident(camera_id, weapon_type, incident_id, detected_at)
+            tx.on_rollback(lambda: detection_cache.forget_incident(incident_id))
+            is_new_incident = True
+    
+    return {"detection_id": detection_id, "incident_id": incident_id, "image_path": image_path,
+            "is_new": is_new, "is_new_incident": is_new_incident}
+
+
+def submit_detection(user_id, camera_id, weapon_type, confidence_score, image_path=None, description=None,
+                     link_duplicates=True, timeout=INGEST_SUBMIT_TIMEOUT):
+    
+    if SERVER_ROLE == "web":
+        # The ingest process owns the writer. Waiting on BEGIN IMMEDIATE here would freeze every
+        # stream greenlet in this worker, while waiting on the bus reply only parks this one.
+        future = Future()
+        try:
+            future.set_result(state_bus_client.call(
+                "submit_detection", user_id, camera_id, weapon_type, confidence_score,
+                image_path, description, link_duplicates
+            ))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    description = description or f"Automatic incident created from {weapon_type} detection"
+    return detection_writer.submit(
+        _record_detection_tx, user_id, camera_id, weapon_type, confidence_score,
+        image_path, description, link_duplicates, timeout=timeout
+    )
+
+
+def process_system_detection(camera_id, weapon_type, confidence_score):
+    
+    from datetime import datetime
+    
+    existing_detection = detection_cache.recent_detection(camera_id, weapon_type)
+    if existing_detection:
+        time_since = (datetime.now() - existing_detection['detection_time']).total_seconds()
+        print(f"⏳ System skipping log for {weapon_type} on camera {camera_id} - recent detection {int(time_since)}s ago")
+        return {"detection_id": existing_detection['detection_id'], "incident_id": None, "image_path": existing_detection['image_path'], "is_new": False}
+
+    result = submit_detection(
+        get_system_user_id(), camera_id, weapon_type, confidence_score, None,
+        f"Automatic system incident for {weapon_type}", link_duplicates=False
+    ).result()
+    if result['is_new']:
+        print(f"✅ Created NEW SYSTEM detection log #{result['detection_id']} for {weapon_type}")
+    return result
+
+
+def _attach_image_tx(tx, camera_id, detections, image_path):
+    
+    ids          = [detection_id for _, detection_id in detections]
+    placeholders = ','.join('?' * len(ids))
+    tx.cursor.execute(f'UPDATE detection_logs SET image_path = ? WHERE id IN ({placeholders}) AND image_path IS NULL',
+                      (image_path, *ids))
+    tx.cursor.execute(f'UPDATE incidents SET image_path = ? WHERE detection_id IN ({placeholders}) AND image_path IS NULL',
+                      (image_path, *ids))
     
-    with _detection_cooldown_lock:
-        system_user_id = 1
+    def _update_cache():
+        for weapon_type, detection_id in detections:
+            detection_cache.attach_image(camera_id, weapon_type, detection_id, image_path)
+    tx.on_commit(_update_cache)
+
+
+def attach_detection_image(camera_id, detections, image_path):
+    
+    return detection_writer.submit(_attach_image_tx, camera_id, detections, image_path)
+
+
+def link_detection_to_incident(detection_id, incident_id):
+    
+    def _link(tx):
+        tx.cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', (incident_id, detection_id))
+    detection_writer.run(_link)
+
+
+_camera_locations = {}
+
+
+def get_camera_location(camera_id):
+    
+    if camera_id not in _camera_locations:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT id FROM users WHERE username = ?', (SYSTEM_USER['username'],))
+            cursor.execute('SELECT location FROM cameras WHERE id = ?', (camera_id,))
             row = cursor.fetchone()
-            if row:
-                system_user_id = row['id']
-                
-            one_minute_ago = datetime.now() - timedelta(minutes=1)
-            cursor.execute('''
-                SELECT id, detection_time, image_path FROM detection_logs 
-                WHERE camera_id = ? 
-                  AND weapon_type = ? 
-                  AND detection_time >= ?
-                ORDER BY detection_time DESC
-                LIMIT 1
-            ''', (camera_id, weapon_type, one_minute_ago))
-            
-            existing_detection = cursor.fetchone()
-            
-            if existing_detection:
-                time_since = (datetime.now() - datetime.fromisoformat(existing_detection['detection_time'])).total_seconds()
-                print(f"⏳ System skipping log for {weapon_type} on camera {camera_id} - recent detection {int(time_since)}s ago")
-                return {"detection_id": existing_detection['id'], "incident_id": None, "image_path": existing_detection['image_path'], "is_new": False}
-
-        image_path = None
-        if image_bytes:
-            try:
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{weapon_type}_{camera_id}_{timestamp}.jpg"
-                IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'incident_images')
-                os.makedirs(IMAGES_DIR, exist_ok=True)
-                filepath = os.path.join(IMAGES_DIR, filename)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(image_bytes)
-                image_path = filename
-            except Exception as e:
-                print(f"❌ Error saving system image: {e}")
-                
-        detection_id = log_detection(system_user_id, camera_id, weapon_type, confidence_score, image_path)
-        print(f"✅ Created NEW SYSTEM detection log #{detection_id} for {weapon_type}")
-        
-        incident_id = None
-        if confidence_score >= 0.80:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                one_minute_ago = datetime.now() - timedelta(minutes=1)
-
-                cursor.execute('''
-                    SELECT id, status FROM incidents 
-                    WHERE camera_id = ? AND weapon_type = ? AND detected_at >= ? AND status IN ('pending', 'responding')
-                    ORDER BY detected_at DESC LIMIT 1
-                ''', (camera_id, weapon_type, one_minute_ago))
-                existing_incident = cursor.fetchone()
-
-                if existing_incident:
-                    incident_id = existing_incident['id']
-                    cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', (incident_id, detection_id))
-                    conn.commit()
-                else:
-                    cursor.execute('SELECT location FROM cameras WHERE id = ?', (camera_id,))
-                    row = cursor.fetchone()
-                    location = row['location'] if row else 'Unknown'
-                    incident_id = create_incident(camera_id, weapon_type, detection_id, system_user_id, location, f"Automatic system incident for {weapon_type}", image_path)
-                    
-        return {"detection_id": detection_id, "incident_id": incident_id, "image_path": image_path, "is_new": True}
+        if not row:
+            return 'Unknown'
+        _camera_locations[camera_id] = row['location']
+    return _camera_locations[camera_id]
 
 
 
@@ -575,11 +897,24 @@ def get_all_cameras():
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''SELECT id, camera_name, location, description, stream_url, rtsp_url, mqtt_topic, is_active, created_at 
+        cursor.execute('''SELECT id, camera_name, location, description, stream_url, rtsp_url, mqtt_topic,
+                                preview_width, preview_height, target_fps, is_active, created_at 
                          FROM cameras ORDER BY id''')
         return cursor.fetchall()
 
 
+def _capture_setting(data, key, cast):
+    
+    value = data.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
 def create_camera(data):
     
     with get_db_connection() as conn:
@@ -593,13 +928,17 @@ def create_camera(data):
 
         try:
             cursor.execute('''INSERT INTO cameras 
-                            (camera_name, location, description, stream_url, rtsp_url, mqtt_topic, is_active) 
-                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                            (camera_name, location, description, stream_url, rtsp_url, mqtt_topic,
+                             preview_width, preview_height, target_fps, is_active) 
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                           (data['camera_name'], data['location'],
                            data.get('description', ''),
                            data.get('stream_url', ''),
                            data.get('rtsp_url', ''),
                            data.get('mqtt_topic', ''),
+                           _capture_setting(data, 'preview_width', int),
+                           _capture_setting(data, 'preview_height', int),
+                           _capture_setting(data, 'target_fps', float),
                            data.get('is_active', True)))
             conn.commit()
             return cursor.lastrowid, None
@@ -614,16 +953,22 @@ def update_camera(camera_id, data):
         try:
             cursor.execute('''UPDATE cameras 
                              SET camera_name = ?, location = ?, description = ?, 
-                                 stream_url = ?, rtsp_url = ?, mqtt_topic = ?, is_active = ?
+                                 stream_url = ?, rtsp_url = ?, mqtt_topic = ?,
+                                 preview_width = ?, preview_height = ?, target_fps = ?, is_active = ?
                              WHERE id = ?''',
                           (data['camera_name'], data['location'],
                            data.get('description', ''),
                            data.get('stream_url', ''),
                            data.get('rtsp_url', ''),
                            data.get('mqtt_topic', ''),
+                           _capture_setting(data, 'preview_width', int),
+                           _capture_setting(data, 'preview_height', int),
+                           _capture_setting(data, 'target_fps', float),
                            data.get('is_active', True),
                            camera_id))
             conn.commit()
+            _camera_locations.pop(camera_id, None)
+            dashboard_cache.invalidate()
             return cursor.rowcount > 0, None
         except sqlite3.IntegrityError:
             return False, "Camera name already exists"
@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidTimeWindow(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([str(sort_value), int(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        return str(sort_value), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"invalid cursor: {e}")
+
+
+def page_limit(requested):
+    if not requested or requested < 1:
+        return PAGE_SIZE_DEFAULT
+    return min(requested, PAGE_SIZE_MAX)
+
+
+def paginate(rows, limit, sort_key):
+
+    # Callers fetch limit + 1 rows; the extra one only proves there is a next page.
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_key], last['id'])
+
+
+def parse_time_window(start_time, end_time):
+
+    def to_minute(value):
+        if not value:
+            return None
+        try:
+            t = datetime.strptime(value, '%H:%M')
+        except ValueError:
+            raise InvalidTimeWindow(f"time must be HH:MM, got '{value}'")
+        return t.hour * 60 + t.minute
+
+    return to_minute(start_time), to_minute(end_time)
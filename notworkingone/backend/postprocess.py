@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from config import POSTPROCESS_WORKERS, POSTPROCESS_QUEUE_SIZE
+
+
+class _Job:
+
+    __slots__ = ("fn", "args", "enqueued_at")
+
+    def __init__(self, fn, args):
+        self.fn          = fn
+        self.args        = args
+        self.enqueued_at = time.monotonic()
+
+
+class PostProcessPool:
+
+
+    def __init__(self, workers=POSTPROCESS_WORKERS, max_queue=POSTPROCESS_QUEUE_SIZE):
+        self.workers   = workers
+        self.max_queue = max_queue
+        self._pending  = OrderedDict()
+        self._cond     = threading.Condition()
+        self._threads  = []
+
+        self.submitted  = 0
+        self.coalesced  = 0
+        self.dropped    = 0
+        self.completed  = 0
+        self.failed     = 0
+        self.running    = 0
+        self.wait_total = 0.0
+        self.wait_max   = 0.0
+        self.run_total  = 0.0
+
+    def _ensure_started(self):
+        if len(self._threads) == self.workers:
+            return
+        for n in range(len(self._threads), self.workers):
+            t = threading.Thread(target=self._worker, name=f"postprocess-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, key, fn, *args):
+
+        with self._cond:
+            self._ensure_started()
+            self.submitted += 1
+            if key in self._pending:
+                # Same camera+weapon still waiting: keep its place in line, run the newer payload.
+                job      = self._pending[key]
+                job.fn   = fn
+                job.args = args
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_queue:
+                self.dropped += 1
+                return False
+            self._pending[key] = _Job(fn, args)
+            self._cond.notify()
+            return True
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                _, job = self._pending.popitem(last=False)
+                self.running += 1
+                started = time.monotonic()
+                waited  = started - job.enqueued_at
+                self.wait_total += waited
+                self.wait_max    = max(self.wait_max, waited)
+
+            ok = True
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                ok = False
+                print(f"❌ Post-processing error: {e}")
+
+            with self._cond:
+                self.running   -= 1
+                self.run_total += time.monotonic() - started
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._cond:
+            done = self.completed + self.failed
+            return {
+                "workers":     self.workers,
+                "queued":      len(self._pending),
+                "capacity":    self.max_queue,
+                "running":     self.running,
+                "submitted":   self.submitted,
+                "coalesced":   self.coalesced,
+                "dropped":     self.dropped,
+                "completed":   self.completed,
+                "failed":      self.failed,
+                "avg_wait_ms": round(self.wait_total / done * 1000, 3) if done else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+                "avg_run_ms":  round(self.run_total / done * 1000, 3) if done else 0.0,
+            }
+
+
+postprocess_pool = PostProcessPool()
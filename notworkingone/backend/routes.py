@@ -1,20 +1,36 @@
 import random
 import requests
 import os
+import json
 import base64
-from datetime import datetime, timedelta
-from flask import Blueprint, request, Response
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, Response, send_file
 from auth import create_token, verify_token, token_required, get_token_from_request, verify_password
 from models import (
     get_user_by_username, get_all_officers, create_user, delete_user, update_password, update_user_profile,
     log_detection, get_weapon_preferences, update_weapon_preferences, get_cameras_list,
-    get_detection_logs, get_dashboard_data,
-    create_incident, get_incidents, get_incident_by_id, update_incident, get_incident_actions, delete_incident,
+    get_detection_logs, count_detection_logs, stream_detection_logs, get_dashboard_data, get_analytics,
+    create_incident, get_incidents, count_incidents, stream_incidents, get_incident_by_id, update_incident, get_incident_actions, delete_incident,
     
-    get_all_cameras, create_camera, update_camera, delete_camera, toggle_camera_status
+    get_all_cameras, create_camera, update_camera, delete_camera, toggle_camera_status,
+    submit_detection
 )
-from config import DEFAULT_WEAPONS
-from stream import generate, get_latest_detection, reload_camera_config
+from config import DEFAULT_WEAPONS, EVENT_KEEPALIVE_SECONDS, IMAGE_CACHE_MAX_AGE, LEGACY_IMAGE_CACHE_MAX_AGE, THUMBNAIL_SIZES
+from config import COUNT_ESTIMATE_CAP, ANALYTICS_DEFAULT_POINTS, ANALYTICS_MAX_POINTS
+from pagination import decode_cursor, page_limit, paginate, parse_time_window, InvalidCursor, InvalidTimeWindow
+from database import get_pool_stats
+from detection_cache import detection_cache
+from ingest import detection_writer, IngestBackpressure
+from events import event_bus, format_sse
+from postprocess import postprocess_pool
+from snapshots import snapshot_writer
+from dashboard_cache import dashboard_cache
+from image_store import IMAGES_DIR, store_image, resolve_variant
+from stream import generate, get_latest_detection, reload_camera_config, get_capture_stats, get_mqtt_stats
+from statebus import state_bus_server, state_bus_client
+from config import SERVER_ROLE
 
 
 auth_bp = Blueprint('auth', __name__)
@@ -25,7 +41,6 @@ incident_bp = Blueprint('incident', __name__)
 admin_bp = Blueprint('admin', __name__)
 
 
-IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'incident_images')
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
 
@@ -63,6 +78,42 @@ def normalize_weapon_type(weapon_type: str) -> str:
     return WEAPON_TYPE_MAP.get(normalized, normalized)
 
 
+EXPORT_FORMATS = {
+    'csv':    ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def export_response(rows, fmt, basename):
+    
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    columns = next(rows)
+    
+    def encode():
+        try:
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                for batch in rows:
+                    writer.writerows(tuple(row) for row in batch)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for batch in rows:
+                    yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in batch)
+        finally:
+            # Closes the export's read connection if the client disconnects mid-download.
+            rows.close()
+    
+    filename = f"{basename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    return Response(encode(), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                             "X-Accel-Buffering": "no"})
+
+
 @auth_bp.post("/login")
 def login():
     try:
@@ -305,6 +356,7 @@ def admin_delete_camera(camera_id):
         
         success, message = delete_camera(camera_id)
         if success:
+            reload_camera_config()
             return {"message": message}
         else:
             return {"error": message}, 400
@@ -336,6 +388,47 @@ def admin_toggle_camera(camera_id):
 
 
 
+@admin_bp.get("/admin/capture-stats")
+@token_required
+def admin_capture_stats():
+    
+    try:
+        if request.user.get('role') != 'admin':
+            return {"error": "Unauthorized - Admin only"}, 403
+        
+        stats = get_capture_stats()
+        return {"cameras": [stats[cam_id] for cam_id in sorted(stats)]}
+    except Exception as e:
+        print(f"Admin capture stats error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
+
+@admin_bp.get("/admin/system-stats")
+@token_required
+def admin_system_stats():
+    
+    try:
+        if request.user.get('role') != 'admin':
+            return {"error": "Unauthorized - Admin only"}, 403
+        
+        return {
+            "db_pool": get_pool_stats(),
+            "detection_cache": detection_cache.stats(),
+            "ingest_writer": detection_writer.stats(),
+            "event_bus": event_bus.stats(),
+            "postprocess": postprocess_pool.stats(),
+            "snapshots": snapshot_writer.stats(),
+            "dashboard_cache": dashboard_cache.stats(),
+            "mqtt": get_mqtt_stats(),
+            "state_bus": state_bus_client.stats() if SERVER_ROLE == "web" else state_bus_server.stats(),
+        }
+    except Exception as e:
+        print(f"Admin system stats error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
+
 @camera_bp.get("/cameras")
 def cameras():
     try:
@@ -403,114 +496,64 @@ def log_det():
         confidence_score = data.get('confidence_score', 0.85)
         image_data = data.get('image')
         
-        from database import get_db_connection
-        from datetime import datetime, timedelta
+        if isinstance(camera_id, str) and camera_id.isdigit():
+            camera_id = int(camera_id)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            one_minute_ago = datetime.now() - timedelta(minutes=1)
-            
-            cursor.execute('''
-                SELECT id, detection_time, image_path FROM detection_logs 
-                WHERE camera_id = ? 
-                  AND weapon_type = ? 
-                  AND detection_time >= ?
-                ORDER BY detection_time DESC
-                LIMIT 1
-            ''', (camera_id, weapon_type, one_minute_ago))
-            
-            existing_detection = cursor.fetchone()
-            
-            if existing_detection:
-                detection_id = existing_detection['id']
-                time_since = (datetime.now() - datetime.fromisoformat(existing_detection['detection_time'])).total_seconds()
-                remaining = int(60 - time_since)
-                
-                print(f"⏳ Skipping log for {weapon_type} on camera {camera_id} - recent detection {int(time_since)}s ago (cooldown: {remaining}s remaining)")
-                
-                is_new_log = False
-                image_path = existing_detection['image_path']
-            else:
-                image_path = None
-                if image_data:
-                    try:
-                        if ',' in image_data:
-                            image_data = image_data.split(',')[1]
-                        
-                        img_bytes = base64.b64decode(image_data)
-                        
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        filename = f"{weapon_type}_{camera_id}_{timestamp}.jpg"
-                        filepath = os.path.join(IMAGES_DIR, filename)
-                        
-                        with open(filepath, 'wb') as f:
-                            f.write(img_bytes)
-                        
-                        image_path = filename
-                        print(f"📸 Saved detection image: {filepath}")
-                    except Exception as e:
-                        print(f"❌ Error saving image: {e}")
-                        import traceback
-                        traceback.print_exc()
-                
-                detection_id = log_detection(user_id, camera_id, weapon_type, confidence_score, image_path)
-                print(f"✅ Created NEW detection log #{detection_id} for {weapon_type} on camera {camera_id}")
-                
-                is_new_log = True
-            
-            incident_id = None
-            is_new_incident = False
+        existing_detection = detection_cache.recent_detection(camera_id, weapon_type)
+        
+        image_path = None
+        if existing_detection:
+            time_since = (datetime.now() - existing_detection['detection_time']).total_seconds()
+            remaining = int(60 - time_since)
             
-            if confidence_score >= 0.80:
-                cursor.execute('''
-                    SELECT id, status FROM incidents 
-                    WHERE camera_id = ? 
-                      AND weapon_type = ? 
-                      AND detected_at >= ? 
-                      AND status IN ('pending', 'responding')
-                    ORDER BY detected_at DESC
-                    LIMIT 1
-                ''', (camera_id, weapon_type, one_minute_ago))
+            print(f"⏳ Skipping log for {weapon_type} on camera {camera_id} - recent detection {int(time_since)}s ago (cooldown: {remaining}s remaining)")
+        elif image_data:
+            try:
+                if ',' in image_data:
+                    image_data = image_data.split(',')[1]
                 
-                existing_incident = cursor.fetchone()
+                img_bytes = base64.b64decode(image_data)
                 
-                if existing_incident:
-                    incident_id = existing_incident['id']
-                    cursor.execute('UPDATE detection_logs SET incident_id = ? WHERE id = ?', 
-                                 (incident_id, detection_id))
-                    conn.commit()
-                    is_new_incident = False
-                else:
-                    cursor.execute('SELECT location FROM cameras WHERE id = ?', (camera_id,))
-                    row = cursor.fetchone()
-                    location = row['location'] if row else 'Unknown'
-                    
-                    incident_id = create_incident(
-                        camera_id, weapon_type, detection_id, user_id, location,
-                        f"Automatic incident created from {weapon_type} detection",
-                        image_path
-                    )
-                    
-                    print(f"🚨 Created NEW incident #{incident_id} for {weapon_type} detection")
-                    is_new_incident = True
-            
-            if incident_id:
-                return {
-                    "message": f"Detection logged and {'NEW' if is_new_incident else 'existing'} incident #{incident_id} {'created' if is_new_incident else 'linked'} for {weapon_type}",
-                    "incident_id": incident_id,
-                    "detection_id": detection_id,
-                    "is_new_log": is_new_log,
-                    "is_new_incident": is_new_incident,
-                    "image_path": image_path
-                }
-            else:
-                return {
-                    "message": "Detection logged successfully (confidence too low for incident)",
-                    "detection_id": detection_id,
-                    "is_new_log": is_new_log,
-                    "image_path": image_path
-                }
+                image_path = store_image(img_bytes)
+                print(f"📸 Saved detection image: {image_path}")
+            except Exception as e:
+                print(f"❌ Error saving image: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        try:
+            result = submit_detection(user_id, camera_id, weapon_type, confidence_score, image_path).result()
+        except IngestBackpressure as e:
+            print(f"⚠️  Log detection rejected: {e}")
+            return {"error": "Detection ingest is busy, retry shortly"}, 503
+        
+        detection_id = result['detection_id']
+        incident_id = result['incident_id']
+        image_path = result['image_path']
+        is_new_log = result['is_new']
+        is_new_incident = result['is_new_incident']
+        
+        if is_new_log:
+            print(f"✅ Created NEW detection log #{detection_id} for {weapon_type} on camera {camera_id}")
+        if is_new_incident:
+            print(f"🚨 Created NEW incident #{incident_id} for {weapon_type} detection")
+        
+        if incident_id:
+            return {
+                "message": f"Detection logged and {'NEW' if is_new_incident else 'existing'} incident #{incident_id} {'created' if is_new_incident else 'linked'} for {weapon_type}",
+                "incident_id": incident_id,
+                "detection_id": detection_id,
+                "is_new_log": is_new_log,
+                "is_new_incident": is_new_incident,
+                "image_path": image_path
+            }
+        else:
+            return {
+                "message": "Detection logged successfully (confidence too low for incident)",
+                "detection_id": detection_id,
+                "is_new_log": is_new_log,
+                "image_path": image_path
+            }
         
     except Exception as e:
         print(f"❌ Log detection error: {e}")
@@ -526,69 +569,107 @@ def get_logs():
         camera_id = request.args.get('camera_id', type=int)
         weapon_type = request.args.get('weapon_type')
         days = request.args.get('days', 7, type=int)
-        limit = request.args.get('limit', 100, type=int)
+        limit = page_limit(request.args.get('limit', type=int))
+        before = decode_cursor(request.args.get('cursor'))
         
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
         
-        logs = get_detection_logs(camera_id, weapon_type, days, limit)
-        
-        if start_time or end_time:
-            filtered_logs = []
-            for log in logs:
-                try:
-                    log_time = datetime.fromisoformat(log['detection_time']).time()
-                    
-                    if start_time and end_time:
-                        start = datetime.strptime(start_time, '%H:%M').time()
-                        end = datetime.strptime(end_time, '%H:%M').time()
-                        
-                        if start <= end:
-                            if start <= log_time <= end:
-                                filtered_logs.append(log)
-                        else:
-                            if log_time >= start or log_time <= end:
-                                filtered_logs.append(log)
-                    elif start_time:
-                        start = datetime.strptime(start_time, '%H:%M').time()
-                        if log_time >= start:
-                            filtered_logs.append(log)
-                    elif end_time:
-                        end = datetime.strptime(end_time, '%H:%M').time()
-                        if log_time <= end:
-                            filtered_logs.append(log)
-                except Exception as e:
-                    print(f"Error filtering log by time: {e}")
-                    continue
-            
-            logs = filtered_logs
+        logs, next_cursor = paginate(
+            get_detection_logs(camera_id, weapon_type, days, limit + 1, before,
+                               parse_time_window(start_time, end_time)),
+            limit, 'detection_time'
+        )
         
-        return {"logs": [dict(log) for log in logs]}
+        return {"logs": [dict(log) for log in logs], "next_cursor": next_cursor}
+    except (InvalidCursor, InvalidTimeWindow) as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         print(f"Get detection logs error: {e}")
         return {"error": "Internal server error"}, 500
 
 
+@detection_bp.get("/detection-logs/export")
+@token_required
+def export_logs():
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        
+        camera_id = request.args.get('camera_id', type=int)
+        weapon_type = request.args.get('weapon_type')
+        days = request.args.get('days', 7, type=int)
+        time_window = parse_time_window(request.args.get('start_time'), request.args.get('end_time'))
+        
+        rows = stream_detection_logs(camera_id, weapon_type, days, time_window)
+        return export_response(rows, fmt, 'detection_logs')
+    except InvalidTimeWindow as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print(f"Export detection logs error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
+@detection_bp.get("/detection-logs/count")
+@token_required
+def count_logs():
+    try:
+        camera_id = request.args.get('camera_id', type=int)
+        weapon_type = request.args.get('weapon_type')
+        days = request.args.get('days', 7, type=int)
+        time_window = parse_time_window(request.args.get('start_time'), request.args.get('end_time'))
+        
+        count = count_detection_logs(camera_id, weapon_type, days, cap=COUNT_ESTIMATE_CAP, time_window=time_window)
+        return {"count": count, "exact": count < COUNT_ESTIMATE_CAP}
+    except InvalidTimeWindow as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print(f"Count detection logs error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
 
 @detection_bp.get("/incident_images/<path:filename>")
 def serve_incident_image(filename):
     
     try:
-        clean_filename = filename.replace('incident_images/', '')
-        filepath = os.path.join(IMAGES_DIR, clean_filename)
-        
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                image_data = f.read()
-            return Response(image_data, mimetype='image/jpeg')
-        else:
+        size = request.args.get('size')
+        if size == 'full':
+            size = None
+        if size is not None and size not in THUMBNAIL_SIZES:
+            return {"error": f"size must be one of: full, {', '.join(THUMBNAIL_SIZES)}"}, 400
+        
+        filepath = resolve_variant(filename, size)
+        if filepath is None:
             return {"error": "Image not found"}, 404
+        
+        # Sharded paths are named by content hash, so a given URL never changes.
+        immutable = '/' in filename.replace('incident_images/', '', 1)
+        etag = os.path.splitext(os.path.basename(filepath))[0].replace('.', '-') if immutable else True
+        response = send_file(filepath, mimetype='image/jpeg', conditional=True, etag=etag,
+                             max_age=IMAGE_CACHE_MAX_AGE if immutable else LEGACY_IMAGE_CACHE_MAX_AGE)
+        if immutable:
+            response.cache_control.immutable = True
+        return response
     except Exception as e:
         print(f"❌ Serve image error: {e}")
         return {"error": "Internal server error"}, 500
 
 
 
+def cached_json_response(key, compute):
+    
+    cached = dashboard_cache.get(key, compute)
+    if cached.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @dashboard_bp.get("/dashboard-data")
 @token_required
 def dashboard():
@@ -597,13 +678,34 @@ def dashboard():
         days = request.args.get('days', 7, type=int)
         camera_id = request.args.get('camera_id', type=int)
         
-        data = get_dashboard_data(user_id, days, camera_id)
-        return data
+        # Not per-user: every viewer of the same range shares one cached, pre-serialised body.
+        key = ("dashboard", days, camera_id, datetime.now(timezone.utc).date())
+        return cached_json_response(key, lambda: get_dashboard_data(user_id, days, camera_id))
     except Exception as e:
         print(f"Dashboard data error: {e}")
         return {"error": "Internal server error"}, 500
 
 
+@dashboard_bp.get("/analytics")
+@token_required
+def analytics():
+    try:
+        days = request.args.get('days', 30, type=int)
+        camera_id = request.args.get('camera_id', type=int)
+        weapon_type = request.args.get('weapon_type')
+        max_points = request.args.get('max_points', ANALYTICS_DEFAULT_POINTS, type=int)
+        
+        if days < 1:
+            return {"error": "days must be positive"}, 400
+        max_points = max(1, min(max_points, ANALYTICS_MAX_POINTS))
+        
+        key = ("analytics", days, camera_id, weapon_type, max_points, datetime.now().strftime('%Y-%m-%d %H'))
+        return cached_json_response(key, lambda: get_analytics(days, camera_id, weapon_type, max_points))
+    except Exception as e:
+        print(f"Analytics error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
 
 @incident_bp.get("/incidents")
 @token_required
@@ -611,7 +713,8 @@ def get_incidents_route():
     try:
         status = request.args.get('status')
         assigned_to = request.args.get('assigned_to', type=int)
-        limit = request.args.get('limit', 100, type=int)
+        limit = page_limit(request.args.get('limit', type=int))
+        before = decode_cursor(request.args.get('cursor'))
         
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
@@ -619,47 +722,69 @@ def get_incidents_route():
         user_id = request.user.get('user_id')
         user_role = request.user.get('role')
         
+        time_window = parse_time_window(start_time, end_time)
         if user_role == 'officer':
-            incidents_list = get_incidents(status, user_id, limit, officer_view=True)
+            incidents_list = get_incidents(status, user_id, limit + 1, officer_view=True, before=before,
+                                           time_window=time_window)
         else:
-            incidents_list = get_incidents(status, assigned_to, limit, officer_view=False)
-        
-        if start_time or end_time:
-            filtered_incidents = []
-            for incident in incidents_list:
-                try:
-                    incident_time = datetime.fromisoformat(incident['detected_at']).time()
-                    
-                    if start_time and end_time:
-                        start = datetime.strptime(start_time, '%H:%M').time()
-                        end = datetime.strptime(end_time, '%H:%M').time()
-                        
-                        if start <= end:
-                            if start <= incident_time <= end:
-                                filtered_incidents.append(incident)
-                        else:
-                            if incident_time >= start or incident_time <= end:
-                                filtered_incidents.append(incident)
-                    elif start_time:
-                        start = datetime.strptime(start_time, '%H:%M').time()
-                        if incident_time >= start:
-                            filtered_incidents.append(incident)
-                    elif end_time:
-                        end = datetime.strptime(end_time, '%H:%M').time()
-                        if incident_time <= end:
-                            filtered_incidents.append(incident)
-                except Exception as e:
-                    print(f"Error filtering incident by time: {e}")
-                    continue
-            
-            incidents_list = filtered_incidents
+            incidents_list = get_incidents(status, assigned_to, limit + 1, officer_view=False, before=before,
+                                           time_window=time_window)
+        incidents_list, next_cursor = paginate(incidents_list, limit, 'detected_at')
         
-        return {"incidents": [dict(inc) for inc in incidents_list]}
+        return {"incidents": [dict(inc) for inc in incidents_list], "next_cursor": next_cursor}
+    except (InvalidCursor, InvalidTimeWindow) as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         print(f"Get incidents error: {e}")
         return {"error": "Internal server error"}, 500
 
 
+@incident_bp.get("/incidents/export")
+@token_required
+def export_incidents():
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        
+        status = request.args.get('status')
+        assigned_to = request.args.get('assigned_to', type=int)
+        time_window = parse_time_window(request.args.get('start_time'), request.args.get('end_time'))
+        
+        if request.user.get('role') == 'officer':
+            rows = stream_incidents(status, request.user.get('user_id'), officer_view=True, time_window=time_window)
+        else:
+            rows = stream_incidents(status, assigned_to, officer_view=False, time_window=time_window)
+        return export_response(rows, fmt, 'incidents')
+    except InvalidTimeWindow as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print(f"Export incidents error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
+@incident_bp.get("/incidents/count")
+@token_required
+def count_incidents_route():
+    try:
+        status = request.args.get('status')
+        assigned_to = request.args.get('assigned_to', type=int)
+        time_window = parse_time_window(request.args.get('start_time'), request.args.get('end_time'))
+        
+        if request.user.get('role') == 'officer':
+            count = count_incidents(status, request.user.get('user_id'), officer_view=True, cap=COUNT_ESTIMATE_CAP,
+                                    time_window=time_window)
+        else:
+            count = count_incidents(status, assigned_to, officer_view=False, cap=COUNT_ESTIMATE_CAP,
+                                    time_window=time_window)
+        return {"count": count, "exact": count < COUNT_ESTIMATE_CAP}
+    except InvalidTimeWindow as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print(f"Count incidents error: {e}")
+        return {"error": "Internal server error"}, 500
+
+
 @incident_bp.get("/incidents/<int:incident_id>")
 @token_required
 def get_incident_detail(incident_id):
@@ -811,6 +936,43 @@ def video_stream():
 
 
 
+@detection_bp.get("/detection-events")
+def detection_events():
+    
+    token = request.args.get("token")
+    if not token or not verify_token(token):
+        return {"error": "Unauthorized"}, 401
+    
+    camera_ids = None
+    if request.args.get("camera_id"):
+        try:
+            camera_ids = [int(c) for c in request.args["camera_id"].split(",") if c.strip()]
+        except ValueError:
+            return {"error": "camera_id must be a comma-separated list of integers"}, 400
+    
+    def event_stream():
+        sub = event_bus.subscribe(camera_ids)
+        try:
+            yield "retry: 3000\n\n"
+            if camera_ids and len(camera_ids) == 1:
+                snapshot = get_latest_detection(camera_ids[0])
+            else:
+                snapshot = get_latest_detection()
+            yield format_sse("snapshot", json.dumps(snapshot, default=str))
+            while True:
+                event = sub.get(timeout=EVENT_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(*event)
+        finally:
+            event_bus.unsubscribe(sub)
+    
+    return Response(event_stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+
 @detection_bp.get("/detection-status")
 def get_detection_status():
     
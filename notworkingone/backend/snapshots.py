@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+import cv2
+from config import SNAPSHOT_QUEUE_SIZE, SNAPSHOT_JPEG_QUALITY
+from ingest import IngestBackpressure
+from image_store import store_image
+
+
+class _Snapshot:
+
+    __slots__ = ("camera_id", "frame", "scale", "objects", "detections", "enqueued_at")
+
+    def __init__(self, camera_id, frame, scale, objects, detections):
+        self.camera_id   = camera_id
+        self.frame       = frame
+        self.scale       = scale
+        self.objects     = objects
+        self.detections  = detections
+        self.enqueued_at = time.monotonic()
+
+
+class SnapshotWriter:
+
+
+    def __init__(self, max_queue=SNAPSHOT_QUEUE_SIZE, quality=SNAPSHOT_JPEG_QUALITY):
+        self.quality = quality
+        self._queue  = queue.Queue(maxsize=max_queue)
+        self._lock   = threading.Lock()
+        self._thread = None
+
+        self.submitted     = 0
+        self.written       = 0
+        self.failed        = 0
+        self.dropped       = 0
+        self.latency_total = 0.0
+        self.latency_max   = 0.0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, camera_id, frame, scale, objects, detections):
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(_Snapshot(camera_id, frame, scale, objects, detections))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            snap = self._queue.get()
+            try:
+                self._write(snap)
+                ok = True
+            except Exception as e:
+                ok = False
+                print(f"❌ Snapshot error on camera {snap.camera_id}: {e}")
+            latency = time.monotonic() - snap.enqueued_at
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                self.latency_total += latency
+                self.latency_max    = max(self.latency_max, latency)
+
+    def _write(self, snap):
+        from stream import draw_boxes_on_frame
+        from models import attach_detection_image
+
+        drawn   = draw_boxes_on_frame(snap.frame, snap.objects, snap.scale)
+        ok, enc = cv2.imencode(".jpg", drawn, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if not ok:
+            raise RuntimeError("JPEG encode failed")
+
+        filename = store_image(enc.tobytes(), image=drawn)
+
+        try:
+            attach_detection_image(snap.camera_id, snap.detections, filename)
+        except IngestBackpressure as e:
+            print(f"⚠️  Snapshot {filename} saved but not linked: {e}")
+        print(f"📸 Saved detection snapshot: {filename}")
+
+    def stats(self):
+        with self._lock:
+            done = self.written + self.failed
+            return {
+                "queued":         self._queue.qsize(),
+                "capacity":       self._queue.maxsize,
+                "submitted":      self.submitted,
+                "written":        self.written,
+                "failed":         self.failed,
+                "dropped":        self.dropped,
+                "avg_latency_ms": round(self.latency_total / done * 1000, 3) if done else 0.0,
+                "max_latency_ms": round(self.latency_max * 1000, 3),
+            }
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,412 @@
+import atexit
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client, AuthenticationError, answer_challenge, deliver_challenge
+from capture import SharedFrameRing, backoff_delay
+from config import SECRET_KEY, STATE_BUS_SOCKET, STATE_BUS_CLIENT_QUEUE, STATE_BUS_CALL_TIMEOUT
+from dashboard_cache import dashboard_cache
+from events import event_bus
+from ingest import IngestBackpressure
+
+
+class StateBusError(Exception):
+    pass
+
+
+# Errors callers handle specifically are re-raised as themselves on the worker side.
+_REMOTE_ERRORS = {"IngestBackpressure": IngestBackpressure}
+
+
+def _authkey():
+    return SECRET_KEY.encode("utf-8")
+
+
+class _BusPeer:
+
+
+    def __init__(self, conn):
+        self.conn    = conn
+        self.queue   = queue.Queue(maxsize=STATE_BUS_CLIENT_QUEUE)
+        self.closed  = False
+        self._thread = threading.Thread(target=self._write_loop, name="state-bus-peer", daemon=True)
+        self._thread.start()
+
+    def send(self, msg):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(msg)
+        except queue.Full:
+            # Dropping one message could leave a frame pointing at a ring the worker never attached,
+            # so a worker that falls this far behind is cut off and resyncs from a fresh snapshot.
+            print("⚠️  State bus worker fell behind, disconnecting it")
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+    def _write_loop(self):
+        while not self.closed:
+            try:
+                msg = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self.conn.send(msg)
+            except (OSError, EOFError, ValueError):
+                self.close()
+
+
+class StateBusServer:
+
+
+    def __init__(self, address=STATE_BUS_SOCKET):
+        self.address  = address
+        self._peers   = set()
+        self._rings   = {}
+        self._seqs    = {}
+        self._calls   = {}
+        self._lock    = threading.Lock()
+        self._started = False
+
+        self.frames      = 0
+        self.calls       = 0
+        self.connections = 0
+
+    def start(self):
+        import models
+        import stream
+
+        if self._started:
+            return
+        self._started = True
+
+        self._calls = {
+            "reload_camera_config": stream.reload_camera_config,
+            "capture_stats":        stream.get_capture_stats,
+            "mqtt_stats":           stream.get_mqtt_stats,
+            # Worker writes go to this process's detection writer so no web worker waits on SQLite's lock.
+            "submit_detection":     lambda *args: models.submit_detection(*args).result(),
+            "delete_user":          models.delete_user,
+            "create_incident":      models.create_incident,
+        }
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # Authentication happens per connection in _serve, so one slow worker cannot stall accept().
+        self._listener = Listener(self.address, family="AF_UNIX")
+        atexit.register(self.close)
+
+        stream.add_frame_listener(self._on_frame)
+        dashboard_cache.add_invalidate_listener(self._on_invalidate)
+        self._events = event_bus.subscribe()
+
+        threading.Thread(target=self._forward_events, name="state-bus-events", daemon=True).start()
+        threading.Thread(target=self._accept_loop, name="state-bus-accept", daemon=True).start()
+        print(f"🔌 State bus listening on {self.address}")
+
+    def serve_forever(self):
+        self.start()
+        while True:
+            time.sleep(3600)
+
+    def close(self):
+        with self._lock:
+            for peer in self._peers:
+                peer.close()
+            self._peers.clear()
+            for ring in self._rings.values():
+                ring.close(unlink=True)
+            self._rings.clear()
+        # Closing the listener also removes the socket file.
+        self._listener.close()
+
+    def _broadcast(self, msg):
+        for peer in list(self._peers):
+            peer.send(msg)
+
+    def _on_frame(self, camera_id, frame, scale):
+        with self._lock:
+            if frame is None:
+                ring = self._rings.pop(camera_id, None)
+                if ring is not None:
+                    self._broadcast(("clear", camera_id))
+                    ring.close(unlink=True)
+                return
+            if not self._peers:
+                return
+
+            ring = self._rings.get(camera_id)
+            if ring is None or ring.shape != frame.shape:
+                old  = ring
+                ring = SharedFrameRing.create(frame.shape)
+                self._rings[camera_id] = ring
+                self._broadcast(("ring", camera_id, ring.name, ring.shape))
+                if old is not None:
+                    old.close(unlink=True)
+
+            seq  = self._seqs.get(camera_id, 0)
+            slot = seq % ring.slots
+            gen  = ring.write(slot, frame)
+            self._seqs[camera_id] = seq + 1
+            self.frames += 1
+            self._broadcast(("frame", camera_id, slot, gen, scale))
+
+    def _on_invalidate(self):
+        self._broadcast(("invalidate",))
+
+    def _forward_events(self):
+        while True:
+            event = self._events.get(timeout=1.0)
+            if event is not None:
+                self._broadcast(("event",) + event)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="state-bus-serve", daemon=True).start()
+
+    def _snapshot(self, peer):
+        import stream
+
+        for camera_id, ring in self._rings.items():
+            peer.send(("ring", camera_id, ring.name, ring.shape))
+        with stream.detection_lock:
+            camera_ids = list(stream.latest_detections)
+        for camera_id in camera_ids:
+            payload = stream.get_latest_detection(camera_id)
+            payload["camera_id"] = camera_id
+            peer.send(("event", "detection", json.dumps(payload, default=str)))
+
+    def _serve(self, conn):
+        try:
+            deliver_challenge(conn, _authkey())
+            answer_challenge(conn, _authkey())
+        except (AuthenticationError, EOFError, OSError):
+            print("⚠️  State bus rejected a connection that failed authentication")
+            conn.close()
+            return
+
+        peer = _BusPeer(conn)
+        with self._lock:
+            self._snapshot(peer)
+            self._peers.add(peer)
+            self.connections += 1
+        try:
+            while not peer.closed:
+                msg = conn.recv()
+                if msg[0] == "call":
+                    self.calls += 1
+                    # Writes can wait on the detection writer; don't hold up this worker's other messages.
+                    threading.Thread(target=self._call, args=(peer, msg), name="state-bus-call", daemon=True).start()
+                elif msg[0] == "invalidate":
+                    dashboard_cache.invalidate(propagate=False)
+                    self._broadcast(("invalidate",))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._peers.discard(peer)
+            peer.close()
+
+    def _call(self, peer, msg):
+        _, req_id, name, args = msg
+        try:
+            peer.send(("reply", req_id, self._calls[name](*args), None))
+        except Exception as e:
+            peer.send(("reply", req_id, None, (type(e).__name__, str(e))))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "role":        "server",
+                "workers":     len(self._peers),
+                "connections": self.connections,
+                "cameras":     sorted(self._rings),
+                "frames":      self.frames,
+                "calls":       self.calls,
+            }
+
+
+class StateBusClient:
+
+
+    def __init__(self, address=STATE_BUS_SOCKET):
+        self.address    = address
+        self._conn      = None
+        self._send_lock = threading.Lock()
+        self._pending   = {}
+        self._ids       = itertools.count(1)
+        self._rings     = {}
+        self._started   = False
+
+        self.frames     = 0
+        self.stale      = 0
+        self.events     = 0
+        self.reconnects = 0
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        dashboard_cache.add_invalidate_listener(self._on_invalidate)
+        threading.Thread(target=self._run, name="state-bus-client", daemon=True).start()
+
+    def call(self, name, *args):
+
+        conn = self._conn
+        if conn is None:
+            raise StateBusError("ingest process is not connected")
+        req_id = next(self._ids)
+        future = Future()
+        self._pending[req_id] = future
+        try:
+            with self._send_lock:
+                conn.send(("call", req_id, name, args))
+            return future.result(timeout=STATE_BUS_CALL_TIMEOUT)
+        except (OSError, EOFError) as e:
+            raise StateBusError(f"state bus call {name} failed: {e}")
+        finally:
+            self._pending.pop(req_id, None)
+
+    def _on_invalidate(self):
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            with self._send_lock:
+                conn.send(("invalidate",))
+        except (OSError, EOFError):
+            pass
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                conn = Client(self.address, family="AF_UNIX")
+                # gevent leaves socket fds non-blocking, which Connection.recv() does not expect;
+                # waiting happens in poll() below instead.
+                os.set_blocking(conn.fileno(), True)
+                answer_challenge(conn, _authkey())
+                deliver_challenge(conn, _authkey())
+            except (OSError, EOFError, AuthenticationError):
+                failures += 1
+                time.sleep(backoff_delay(failures))
+                continue
+
+            failures   = 0
+            self._conn = conn
+            print(f"🔌 Connected to state bus at {self.address}")
+            # Whatever changed while disconnected is unknown, so start from a clean cache.
+            dashboard_cache.invalidate(propagate=False)
+            try:
+                while True:
+                    # poll() goes through selectors, so under gevent this yields instead of blocking the hub.
+                    if conn.poll(1.0):
+                        self._dispatch(conn.recv())
+            except (EOFError, OSError):
+                pass
+            finally:
+                self._conn = None
+                conn.close()
+                self._disconnected()
+
+    def _disconnected(self):
+        import stream
+
+        self.reconnects += 1
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(StateBusError("state bus disconnected"))
+        for camera_id, ring in list(self._rings.items()):
+            stream._clear_frame(camera_id)
+            ring.close()
+        self._rings.clear()
+        print("⚠️  State bus disconnected, reconnecting")
+
+    def _dispatch(self, msg):
+        import stream
+
+        kind = msg[0]
+        if kind == "frame":
+            _, camera_id, slot, gen, scale = msg
+            ring = self._rings.get(camera_id)
+            if ring is None:
+                return
+            # The server reuses slots without waiting for workers, so a worker that is behind
+            # drops frames whose slot has since been rewritten instead of publishing a torn one.
+            frame = ring.read(slot, gen)
+            if frame is None:
+                self.stale += 1
+                return
+            self.frames += 1
+            stream.publish_frame(camera_id, frame, scale)
+        elif kind == "event":
+            _, event_type, data = msg
+            payload = json.loads(data)
+            self.events += 1
+            if event_type == "detection":
+                stream.apply_detection_state(payload["camera_id"], payload)
+            event_bus.publish(event_type, payload.get("camera_id"), payload)
+        elif kind == "ring":
+            _, camera_id, name, shape = msg
+            old = self._rings.pop(camera_id, None)
+            if old is not None:
+                old.close()
+            try:
+                self._rings[camera_id] = SharedFrameRing.attach(name, shape, track=False)
+            except FileNotFoundError:
+                return
+            stream._ensure_frame_slot(camera_id)
+        elif kind == "clear":
+            stream._clear_frame(msg[1])
+            ring = self._rings.pop(msg[1], None)
+            if ring is not None:
+                ring.close()
+        elif kind == "invalidate":
+            dashboard_cache.invalidate(propagate=False)
+        elif kind == "reply":
+            _, req_id, result, error = msg
+            future = self._pending.get(req_id)
+            if future is not None and not future.done():
+                if error:
+                    name, message = error
+                    if name in _REMOTE_ERRORS:
+                        future.set_exception(_REMOTE_ERRORS[name](message))
+                    else:
+                        future.set_exception(StateBusError(f"{name}: {message}"))
+                else:
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "role":       "client",
+            "connected":  self.connected,
+            "cameras":    sorted(self._rings),
+            "frames":     self.frames,
+            "stale":      self.stale,
+            "events":     self.events,
+            "reconnects": self.reconnects,
+        }
+
+
+state_bus_server = StateBusServer()
+state_bus_client = StateBusClient()
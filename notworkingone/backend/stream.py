@@ -1,10 +1,19 @@
+import atexit
 import time
 import cv2
 import paho.mqtt.client as paho
 from paho import mqtt
 import json
 import threading
+import multiprocessing
 from datetime import datetime
+from capture import run_capture, decode_process_main, SharedFrameRing, CaptureSettings
+from config import CAPTURE_MODE, MQTT_HOST, MQTT_PORT, MQTT_TLS, MQTT_USERNAME, MQTT_PASSWORD, MQTT_SHARED_GROUP, SERVER_ROLE, INGEST_RUNTIME
+from ingest import IngestBackpressure
+from events import event_bus
+from postprocess import postprocess_pool
+from snapshots import snapshot_writer
+from statebus import state_bus_client, StateBusError
 
 
 latest_detections = {}          
@@ -13,12 +22,20 @@ mqtt_client       = None
 
 latest_raw_frames = {}          
 frame_locks       = {}          
-capture_threads   = {}          
+frame_seqs        = {}          
+frame_scales      = {}          
+_frame_listeners  = []
+
+STREAM_MAX_FPS    = 15
 
 
 _topic_to_camera  = {}
 _config_lock      = threading.Lock()
 
+_subscribed_topics = set()
+_mqtt_stats        = {"received": 0, "unknown_topic": 0, "bad_json": 0, "dropped": 0}
+_mqtt_lock         = threading.Lock()
+
 
 
 
@@ -63,7 +80,8 @@ def _load_camera_config():
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, rtsp_url, mqtt_topic FROM cameras WHERE is_active = 1"
+                "SELECT id, rtsp_url, mqtt_topic, preview_width, preview_height, target_fps "
+                "FROM cameras WHERE is_active = 1"
             )
             rows = cursor.fetchall()
         return rows
@@ -76,6 +94,14 @@ def reload_camera_config():
     
     global _topic_to_camera
 
+    if SERVER_ROLE == "web":
+        # Cameras and MQTT belong to the ingest process; the change is already in the database.
+        try:
+            state_bus_client.call("reload_camera_config")
+        except StateBusError as e:
+            print(f"⚠️  Could not forward camera reload to ingest process: {e}")
+        return
+
     rows = _load_camera_config()
 
     new_topic_map  = {}
@@ -87,7 +113,9 @@ def reload_camera_config():
         topic     = (row["mqtt_topic"] or "").strip()
 
         if rtsp_url:
-            rtsp_map[cam_id] = rtsp_url
+            rtsp_map[cam_id] = CaptureSettings(
+                rtsp_url, row["preview_width"], row["preview_height"], row["target_fps"]
+            )
 
         if topic:
             new_topic_map[topic] = cam_id
@@ -95,15 +123,62 @@ def reload_camera_config():
     with _config_lock:
         _topic_to_camera  = new_topic_map
 
-    
-    for cam_id, rtsp_url in rtsp_map.items():
-        if cam_id not in capture_threads or not capture_threads[cam_id].is_alive():
-            _start_one_capture_thread(cam_id, rtsp_url)
+    capture_supervisor.sync(rtsp_map)
+    _sync_subscriptions()
 
     print(f"📡 Camera config loaded: {len(rows)} cameras | "
           f"topics={list(new_topic_map.keys())}")
 
 
+def _subscription(topic):
+    # The broker hands each message on a shared subscription to one member of the group.
+    return f"$share/{MQTT_SHARED_GROUP}/{topic}" if MQTT_SHARED_GROUP else topic
+
+
+def _sync_subscriptions():
+    
+    client = mqtt_client
+    if client is None or not client.is_connected():
+        # on_connect subscribes to the current set once the session is up.
+        return
+
+    with _mqtt_lock:
+        with _config_lock:
+            wanted = set(_topic_to_camera)
+        added   = sorted(wanted - _subscribed_topics)
+        removed = sorted(_subscribed_topics - wanted)
+        if added:
+            client.subscribe([(_subscription(topic), 0) for topic in added])
+        if removed:
+            client.unsubscribe([_subscription(topic) for topic in removed])
+        _subscribed_topics.clear()
+        _subscribed_topics.update(wanted)
+
+    if added or removed:
+        print(f"📡 MQTT subscriptions: +{added} -{removed}")
+
+
+def _count(counter):
+    with _mqtt_lock:
+        _mqtt_stats[counter] += 1
+
+
+def get_mqtt_stats():
+    
+    if SERVER_ROLE == "web":
+        return state_bus_client.call("mqtt_stats")
+    if INGEST_RUNTIME == "async":
+        from ingest_async import live_stats
+        return live_stats()
+    with _mqtt_lock:
+        return {
+            "connected": mqtt_client is not None and mqtt_client.is_connected(),
+            "shared_group": MQTT_SHARED_GROUP or None,
+            "topics":    sorted(_subscribed_topics),
+            **_mqtt_stats,
+        }
+
+
 def _resolve_camera_id(mqtt_topic: str):
     
     with _config_lock:
@@ -115,59 +190,357 @@ def _resolve_camera_id(mqtt_topic: str):
 
 
 
-def _start_one_capture_thread(camera_id, rtsp_url):
+class CaptureWorker:
+
+    def __init__(self, camera_id, settings):
+        self.camera_id   = camera_id
+        self.settings    = settings
+        self.rtsp_url    = settings.rtsp_url
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._thread     = None
+
+        self.state          = "starting"
+        self.reconnects     = 0
+        self.frames_total   = 0
+        self.frames_stale   = 0
+        self.fps_in         = 0.0
+        self.decode_ms      = 0.0
+        self.last_frame_at  = None
+        self._window_start  = time.monotonic()
+        self._window_frames = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        print(f"🎥 Capture worker started for camera {self.camera_id}  ({self.rtsp_url[:40]}...)")
+
+    def request_stop(self):
+        self._stop_event.set()
+
+    def stop(self, timeout=2.0):
+        self.request_stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        print(f"🛑 Capture worker stopped for camera {self.camera_id}")
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _record_frame(self, decode_seconds):
+        now = time.monotonic()
+        with self._stats_lock:
+            self.frames_total   += 1
+            self.last_frame_at   = now
+            self.decode_ms       = 0.9 * self.decode_ms + 0.1 * decode_seconds * 1000.0
+            self._window_frames += 1
+            elapsed = now - self._window_start
+            if elapsed >= 1.0:
+                self.fps_in         = self._window_frames / elapsed
+                self._window_start  = now
+                self._window_frames = 0
+
+    def _on_frame(self, frame, decode_seconds, scale=1.0):
+        if self._stop_event.is_set():
+            return
+        self.state = "streaming"
+        self._record_frame(decode_seconds)
+        publish_frame(self.camera_id, frame, scale)
+
+    def _on_state(self, state, reconnect):
+        self.state = state
+        if reconnect:
+            self.reconnects += 1
+
+    def _run(self):
+        run_capture(self.settings, self._stop_event, self._on_frame, self._on_state)
+
+    def stats(self):
+        with self._stats_lock:
+            age = None
+            if self.last_frame_at is not None:
+                age = round(time.monotonic() - self.last_frame_at, 3)
+            return {
+                "camera_id":      self.camera_id,
+                "state":          self.state,
+                "fps_in":         round(self.fps_in, 2),
+                "frames_total":   self.frames_total,
+                "frames_stale":   self.frames_stale,
+                "reconnects":     self.reconnects,
+                "last_frame_age": age,
+                "decode_ms":      round(self.decode_ms, 2),
+                "target_fps":     self.settings.target_fps,
+            }
+
+
+class CaptureSupervisor:
+
+    drain_grace   = 2.0
+    restart_after = 5.0
+
+    def __init__(self):
+        self._workers  = {}
+        self._draining = {}
+        self._pending  = {}
+        self._lock     = threading.Lock()
+        self._watcher  = None
+
+    def sync(self, rtsp_map):
+        
+        with self._lock:
+            self._reap()
+            for cam_id in list(self._workers):
+                worker = self._workers[cam_id]
+                if rtsp_map.get(cam_id) != worker.settings or not worker.is_alive():
+                    # Never join here: FFmpeg can sit in open/read for ~30 s with the lock held.
+                    worker.request_stop()
+                    if worker.is_alive():
+                        self._draining.setdefault(cam_id, []).append((worker, time.monotonic()))
+                    del self._workers[cam_id]
+                    if cam_id not in rtsp_map:
+                        _clear_frame(cam_id)
+
+            self._pending = {}
+            for cam_id, settings in rtsp_map.items():
+                if cam_id in self._workers:
+                    continue
+                if cam_id in self._draining:
+                    # The old capture still holds this camera's frame slot; start once it has exited.
+                    self._pending[cam_id] = settings
+                else:
+                    self._start(cam_id, settings)
+
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_loop, name="capture-supervisor", daemon=True)
+                self._watcher.start()
+                atexit.register(self.stop_all)
+
+    def _start(self, cam_id, settings):
+        _ensure_frame_slot(cam_id)
+        worker_cls = CAPTURE_WORKER_TYPES.get(CAPTURE_MODE, CaptureWorker)
+        worker = worker_cls(cam_id, settings)
+        worker.start()
+        self._workers[cam_id] = worker
+
+    def _reap(self):
+        now = time.monotonic()
+        for cam_id, draining in list(self._draining.items()):
+            alive = []
+            for worker, stopped_at in draining:
+                if not worker.is_alive():
+                    print(f"🛑 Capture worker stopped for camera {cam_id}")
+                    continue
+                if now - stopped_at > self.drain_grace and hasattr(worker, "force_stop"):
+                    # Only a decode process can be killed; a capture thread stuck in FFmpeg has to return on its own.
+                    worker.force_stop()
+                alive.append((worker, stopped_at))
+            if alive:
+                self._draining[cam_id] = alive
+            else:
+                del self._draining[cam_id]
+
+        for cam_id in list(self._pending):
+            if cam_id not in self._draining:
+                self._start(cam_id, self._pending.pop(cam_id))
+
+    def _restart_dead(self):
+        for cam_id, worker in list(self._workers.items()):
+            if not worker.is_alive():
+                # A decode process can die (crash, OOM kill) without anything else noticing.
+                print(f"♻️  Capture worker for camera {cam_id} exited, restarting")
+                del self._workers[cam_id]
+                self._start(cam_id, worker.settings)
+
+    def _watch_loop(self):
+        last_check = time.monotonic()
+        while True:
+            time.sleep(0.5)
+            with self._lock:
+                self._reap()
+                if time.monotonic() - last_check >= self.restart_after:
+                    last_check = time.monotonic()
+                    self._restart_dead()
+
+    def stop_all(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            workers += [worker for draining in self._draining.values() for worker, _ in draining]
+            self._workers.clear()
+            self._draining.clear()
+            self._pending.clear()
+        # Signal everything first so the joins overlap instead of waiting out each camera in turn.
+        for worker in workers:
+            worker.request_stop()
+        for worker in workers:
+            worker.stop()
+
+    def stats(self):
+        with self._lock:
+            workers  = list(self._workers.values())
+            draining = {cam_id: len(entries) for cam_id, entries in self._draining.items()}
+            pending  = list(self._pending)
+        stats = {w.camera_id: w.stats() for w in workers}
+        for cam_id in pending:
+            stats[cam_id] = {"camera_id": cam_id, "state": "waiting"}
+        for cam_id, count in draining.items():
+            stats.setdefault(cam_id, {"camera_id": cam_id, "state": "stopping"})["draining"] = count
+        return stats
+
+
+class ProcessCaptureWorker(CaptureWorker):
+
+    
+    _mp = multiprocessing.get_context("spawn")
+
+    def start(self):
+        recv_conn, send_conn = self._mp.Pipe(duplex=False)
+        self._mp_stop = self._mp.Event()
+        self._process = self._mp.Process(
+            target=decode_process_main,
+            args=(self.settings, send_conn, self._mp_stop),
+            daemon=True,
+        )
+        self._process.start()
+        send_conn.close()
+        self._conn = recv_conn
+        super().start()
+
+    def request_stop(self):
+        self._mp_stop.set()
+        super().request_stop()
+
+    def stop(self, timeout=2.0):
+        self._mp_stop.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        super().stop(timeout)
+
+    def force_stop(self):
+        # Unlike a thread, a decode process stuck in FFmpeg can be killed outright.
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def _run(self):
+        ring = None
+        try:
+            while not self._stop_event.is_set():
+                if not self._conn.poll(0.5):
+                    continue
+                try:
+                    msg = self._conn.recv()
+                except EOFError:
+                    break
+
+                kind = msg[0]
+                if kind == "ring":
+                    if ring is not None:
+                        ring.close()
+                    try:
+                        ring = SharedFrameRing.attach(msg[1], msg[2])
+                    except FileNotFoundError:
+                        ring = None
+                elif kind == "frame" and ring is not None:
+                    _, slot, gen, decode_seconds, scale = msg
+                    frame = ring.read(slot, gen)
+                    if frame is None:
+                        # The child reuses slots without waiting for us; a lapped slot holds a newer frame.
+                        self.frames_stale += 1
+                        continue
+                    self._on_frame(frame, decode_seconds, scale)
+                elif kind == "state":
+                    self._on_state(msg[1], msg[2])
+        finally:
+            if ring is not None:
+                ring.close()
+            self._conn.close()
+            self.state = "stopped"
+
+
+CAPTURE_WORKER_TYPES = {
+    "thread":  CaptureWorker,
+    "process": ProcessCaptureWorker,
+}
+
+
+capture_supervisor = CaptureSupervisor()
+
+
+def _ensure_frame_slot(camera_id):
     if camera_id not in frame_locks:
-        frame_locks[camera_id]       = threading.Lock()
+        frame_locks[camera_id]       = threading.Condition()
         latest_raw_frames[camera_id] = None
+        frame_seqs[camera_id]        = 0
+        frame_scales[camera_id]      = 1.0
 
-    t = threading.Thread(
-        target=capture_loop, args=(camera_id, rtsp_url), daemon=True
-    )
-    t.start()
-    capture_threads[camera_id] = t
-    print(f"🎥 Capture thread started for camera {camera_id}  ({rtsp_url[:40]}...)")
-
-
-def capture_loop(camera_id, rtsp_url):
-    cap = None
-
-    def open_cap():
-        c = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-        if c.isOpened():
-            c.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            c.set(cv2.CAP_PROP_FPS, 10)
-            return c
-        return None
-
-    while True:
-        if cap is None or not cap.isOpened():
-            cap = open_cap()
-            if cap is None:
-                time.sleep(0.5)
-                continue
 
-        ok, frame = cap.read()
-        if not ok or frame is None:
-            try:
-                cap.release()
-            except Exception:
-                pass
-            cap = None
-            time.sleep(0.2)
-            continue
+def add_frame_listener(fn):
+    _frame_listeners.append(fn)
+
 
+def _notify_frame_listeners(camera_id, frame, scale):
+    for fn in _frame_listeners:
+        try:
+            fn(camera_id, frame, scale)
+        except Exception as e:
+            print(f"⚠️  Frame listener error for camera {camera_id}: {e}")
+
+
+def _clear_frame(camera_id):
+    if camera_id in frame_locks:
         with frame_locks[camera_id]:
-            latest_raw_frames[camera_id] = frame
+            latest_raw_frames[camera_id] = None
+    _notify_frame_listeners(camera_id, None, 1.0)
+
+
+def publish_frame(camera_id, frame, scale=1.0):
+    with frame_locks[camera_id]:
+        latest_raw_frames[camera_id] = frame
+        frame_scales[camera_id]      = scale
+        frame_seqs[camera_id]       += 1
+        frame_locks[camera_id].notify_all()
+    _notify_frame_listeners(camera_id, frame, scale)
+
+
+def wait_for_frame(camera_id, last_seq, timeout=1.0):
+    
+    cond = frame_locks.get(camera_id)
+    if cond is None:
+        time.sleep(min(timeout, 0.1))
+        return last_seq, None, 1.0
+
+    with cond:
+        if frame_seqs[camera_id] == last_seq:
+            cond.wait(timeout)
+        seq = frame_seqs[camera_id]
+        if seq == last_seq:
+            return last_seq, None, 1.0
+        return seq, latest_raw_frames[camera_id], frame_scales[camera_id]
 
 
 def start_capture_threads():
     
+    if SERVER_ROLE == "web":
+        return
     reload_camera_config()
 
 
+def get_capture_stats():
+    
+    # Web workers only own the MJPEG broadcasters; capture health comes from the ingest process.
+    stats = state_bus_client.call("capture_stats") if SERVER_ROLE == "web" else capture_supervisor.stats()
+    for cam_id, broadcaster in list(_broadcasters.items()):
+        stats.setdefault(cam_id, {"camera_id": cam_id, "state": "stopped"})
+        stats[cam_id]["stream"] = broadcaster.stats()
+    return stats
+
+
 
 
-def draw_boxes_on_frame(frame, detection_objects):
+def draw_boxes_on_frame(frame, detection_objects, scale=1.0):
     for weapon_type, data in detection_objects.items():
         boxes       = data.get("boxes", [])
         confidences = data.get("confidences", [])
@@ -177,7 +550,7 @@ def draw_boxes_on_frame(frame, detection_objects):
 
         for i, box in enumerate(boxes):
             if len(box) == 4:
-                x1, y1, x2, y2 = map(int, box)
+                x1, y1, x2, y2 = (int(v * scale) for v in box)
                 conf = confidences[i]
 
                 cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
@@ -194,92 +567,127 @@ def draw_boxes_on_frame(frame, detection_objects):
 
 def on_connect(client, _userdata, flags, rc, properties=None):
     print(f"MQTT CONNACK rc={rc}")
+    if rc != 0:
+        return
+    # A new session starts with no subscriptions, so resubscribe everything.
+    with _mqtt_lock:
+        _subscribed_topics.clear()
+    _sync_subscriptions()
 
 
-def on_message(client, _userdata, msg):
+def normalize_objects(parsed, log=False):
+    
+    processed_objects = {}
+    for raw_weapon_type, data in (parsed.get("objects") or {}).items():
+        weapon_type = _normalize_weapon(raw_weapon_type)   
+        if log and raw_weapon_type != weapon_type:
+            print(f"  🔄 Normalised weapon type: '{raw_weapon_type}' → '{weapon_type}'")
+
+        confs = data.get("confidences", [])
+        if not isinstance(confs, list):
+            confs = [confs]
+        processed_objects[weapon_type] = {
+            "count":       len(confs),
+            "confidences": confs,
+            "boxes":       data.get("boxes", []),
+        }
+    return processed_objects
+
+
+def average_confidence(data):
+    confs = data.get("confidences", [])
+    return sum(confs) / len(confs) if confs else 0.85
+
+
+def update_detection_state(camera_id, parsed, processed_objects):
+    
+    with detection_lock:
+        if camera_id not in latest_detections:
+            latest_detections[camera_id] = {}
+        latest_detections[camera_id]["detected"]  = parsed.get("detected", False)
+        latest_detections[camera_id]["objects"]   = processed_objects
+        latest_detections[camera_id]["timestamp"] = datetime.now().isoformat()
+
+    publish_detection_event(camera_id)
+
+
+def note_incident(camera_id, incident_id):
+    
+    with detection_lock:
+        latest_detections.setdefault(camera_id, {})["latest_incident_id"] = incident_id
+    publish_detection_event(camera_id, incident_id)
+
+
+def snapshot_frame(camera_id):
+    
+    if camera_id in frame_locks:
+        with frame_locks[camera_id]:
+            if latest_raw_frames.get(camera_id) is not None:
+                return latest_raw_frames[camera_id].copy(), frame_scales[camera_id]
+    return None, 1.0
+
+
+def process_and_log(camera_id, processed_objects, current_frame, frame_scale):
     from models import process_system_detection
 
+    new_detections = []
+    for weapon_type, data in processed_objects.items():
+        try:
+            result = process_system_detection(camera_id, weapon_type, average_confidence(data))
+        except IngestBackpressure as e:
+            print(f"⚠️  Dropped {weapon_type} detection on camera {camera_id}: {e}")
+            continue
+        if result.get("is_new"):
+            print(f"  → Logged detection #{result['detection_id']}")
+            new_detections.append((weapon_type, result["detection_id"]))
+            if result.get("incident_id"):
+                note_incident(camera_id, result["incident_id"])
+
+    # One annotated snapshot per message, rendered and written off this thread.
+    if new_detections and current_frame is not None:
+        if not snapshot_writer.submit(camera_id, current_frame, frame_scale,
+                                      processed_objects, new_detections):
+            print(f"⚠️  Snapshot queue full, no image for camera {camera_id}")
+
+
+def on_message(client, _userdata, msg):
+
+    _count("received")
     try:
-        parsed       = json.loads(msg.payload.decode("utf-8"))
+        # Resolve before decoding: a message left over from a just-removed topic is not worth parsing.
         camera_id    = _resolve_camera_id(msg.topic)
-
         if camera_id is None:
-            print(f"⚠️  Ignoring message on topic '{msg.topic}' - no configured camera match.")
+            _count("unknown_topic")
             return
 
+        parsed       = json.loads(msg.payload.decode("utf-8"))
+
         print(f"\n{'='*50}")
         print(f"MQTT  topic={msg.topic}  →  camera_id={camera_id}")
         print(f"Payload: {json.dumps(parsed, indent=2)}")
         print(f"{'='*50}\n")
 
         
-        processed_objects = {}
-        for raw_weapon_type, data in parsed.get("objects", {}).items():
-            weapon_type = _normalize_weapon(raw_weapon_type)   
-            if raw_weapon_type != weapon_type:
-                print(f"  🔄 Normalised weapon type: '{raw_weapon_type}' → '{weapon_type}'")
-
-            confs = data.get("confidences", [])
-            if not isinstance(confs, list):
-                confs = [confs]
-            processed_objects[weapon_type] = {
-                "count":       len(confs),
-                "confidences": confs,
-                "boxes":       data.get("boxes", []),
-            }
-
-        
-        with detection_lock:
-            if camera_id not in latest_detections:
-                latest_detections[camera_id] = {}
-            latest_detections[camera_id]["detected"]  = parsed.get("detected", False)
-            latest_detections[camera_id]["objects"]   = processed_objects
-            latest_detections[camera_id]["timestamp"] = datetime.now().isoformat()
+        processed_objects = normalize_objects(parsed, log=True)
+        update_detection_state(camera_id, parsed, processed_objects)
 
         
         if parsed.get("detected") and processed_objects:
             print(f"🚨 WEAPON DETECTED on camera {camera_id}!")
 
-            
-            current_frame = None
-            if camera_id in frame_locks:
-                with frame_locks[camera_id]:
-                    if latest_raw_frames.get(camera_id) is not None:
-                        current_frame = latest_raw_frames[camera_id].copy()
-
-            def process_and_log():
-                for weapon_type, data in processed_objects.items():
-                    confs          = data.get("confidences", [])
-                    avg_confidence = sum(confs) / len(confs) if confs else 0.85
-
-                    image_bytes = None
-                    if current_frame is not None:
-                        drawn = draw_boxes_on_frame(
-                            current_frame.copy(), {weapon_type: data}
-                        )
-                        ok, enc = cv2.imencode(
-                            ".jpg", drawn, [int(cv2.IMWRITE_JPEG_QUALITY), 80]
-                        )
-                        if ok:
-                            image_bytes = enc.tobytes()
-
-                    result = process_system_detection(
-                        camera_id, weapon_type, avg_confidence, image_bytes
-                    )
-                    if result.get("is_new"):
-                        print(f"  → Logged detection #{result['detection_id']}")
-                        if result.get("incident_id"):
-                            with detection_lock:
-                                latest_detections.setdefault(camera_id, {})[
-                                    "latest_incident_id"
-                                ] = result["incident_id"]
-                                
-            
-            threading.Thread(target=process_and_log, daemon=True).start()
+            current_frame, frame_scale = snapshot_frame(camera_id)
+            accepted = postprocess_pool.submit(
+                (camera_id, tuple(sorted(processed_objects))), process_and_log,
+                camera_id, processed_objects, current_frame, frame_scale
+            )
+            if not accepted:
+                _count("dropped")
+                print(f"⚠️  Post-processing queue full, dropped detection on camera {camera_id}")
         else:
             print("✓ No threats detected")
 
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        _count("bad_json")
         print(f"Bad JSON: {e}")
     except Exception as e:
         print(f"Error in on_message: {e}")
@@ -289,6 +697,28 @@ def on_message(client, _userdata, msg):
 
 
 
+def publish_detection_event(camera_id, incident_id=None):
+    
+    payload = get_latest_detection(camera_id)
+    payload["camera_id"] = camera_id
+    if incident_id:
+        from models import get_incident_by_id
+        incident = get_incident_by_id(incident_id)
+        payload["incident"] = dict(incident) if incident else None
+    event_bus.publish("detection", camera_id, payload)
+
+
+def apply_detection_state(camera_id, payload):
+    
+    with detection_lock:
+        latest_detections[camera_id] = {
+            "detected":           payload.get("detected", False),
+            "objects":            payload.get("objects", {}),
+            "timestamp":          payload.get("timestamp"),
+            "latest_incident_id": payload.get("latest_incident_id"),
+        }
+
+
 def get_latest_detection(camera_id=None):
     with detection_lock:
         if not latest_detections:
@@ -321,40 +751,118 @@ def get_latest_detection(camera_id=None):
             }
 
 
-def generate(camera_id=1):
-    
-    start_capture_threads()   
+class FrameBroadcaster:
 
-    while True:
-        frame_copy = None
-        if camera_id in frame_locks:
-            with frame_locks[camera_id]:
-                if latest_raw_frames.get(camera_id) is not None:
-                    frame_copy = latest_raw_frames[camera_id].copy()
+    def __init__(self, camera_id):
+        self.camera_id    = camera_id
+        self._cond        = threading.Condition()
+        self._chunk       = None
+        self._seq         = 0
+        self._subscribers = 0
+        self._thread      = None
 
-        if frame_copy is None:
-            time.sleep(0.1)
-            continue
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
 
+    def wait_for_chunk(self, last_seq, timeout=1.0):
+        with self._cond:
+            if self._seq == last_seq:
+                self._cond.wait(timeout)
+            return self._seq, self._chunk
+
+    def stats(self):
+        with self._cond:
+            return {"subscribers": self._subscribers, "frames_encoded": self._seq}
+
+    def _encode(self, frame, scale):
         with detection_lock:
-            det = latest_detections.get(camera_id, {}).copy()
+            det = latest_detections.get(self.camera_id, {}).copy()
 
+        # Published frames are private copies that are never mutated in place, so only copy when drawing on them.
         if det.get("detected", False):
-            frame_copy = draw_boxes_on_frame(frame_copy, det.get("objects", {}))
+            frame = draw_boxes_on_frame(frame.copy(), det.get("objects", {}), scale)
 
         ok, encoded = cv2.imencode(
-            ".jpg", frame_copy, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+            ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
         )
         if not ok:
-            continue
+            return None
 
-        yield (
+        return (
             b"--frame\r\n"
             b"Content-Type: image/jpeg\r\n\r\n"
             + encoded.tobytes()
             + b"\r\n"
         )
-        time.sleep(0.06)   
+
+    def _run(self):
+        frame_seq    = 0
+        min_interval = 1.0 / STREAM_MAX_FPS
+        last_encode  = 0.0
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+
+            frame_seq, frame, scale = wait_for_frame(self.camera_id, frame_seq)
+            if frame is None:
+                continue
+
+            wait = min_interval - (time.monotonic() - last_encode)
+            if wait > 0:
+                time.sleep(wait)
+                frame_seq, newer, newer_scale = wait_for_frame(self.camera_id, frame_seq, timeout=0)
+                if newer is not None:
+                    frame, scale = newer, newer_scale
+
+            chunk = self._encode(frame, scale)
+            last_encode = time.monotonic()
+            if chunk is None:
+                continue
+
+            with self._cond:
+                self._chunk = chunk
+                self._seq  += 1
+                self._cond.notify_all()
+
+
+_broadcasters      = {}
+_broadcasters_lock = threading.Lock()
+
+
+def get_broadcaster(camera_id):
+    with _broadcasters_lock:
+        if camera_id not in _broadcasters:
+            _broadcasters[camera_id] = FrameBroadcaster(camera_id)
+        return _broadcasters[camera_id]
+
+
+def generate(camera_id=1):
+    
+    start_capture_threads()   
+
+    broadcaster = get_broadcaster(camera_id)
+    broadcaster.subscribe()
+    try:
+        last_seq = 0
+        while True:
+            # Slow viewers simply skip to the newest chunk; the encoder never waits on them.
+            seq, chunk = broadcaster.wait_for_chunk(last_seq)
+            if chunk is None or seq == last_seq:
+                continue
+            last_seq = seq
+            yield chunk
+    finally:
+        broadcaster.unsubscribe()
 
 
 
@@ -371,17 +879,14 @@ def start_mqtt_client():
     mqtt_client = paho.Client(client_id="", userdata=None, protocol=paho.MQTTv5)
     mqtt_client.on_connect = on_connect
     mqtt_client.on_message = on_message
-    mqtt_client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-    mqtt_client.username_pw_set(
-        "hivemq.webclient.1757927568300", "r$i.g1>23O5TMdLAcp:H"
-    )
+    if MQTT_TLS:
+        mqtt_client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    if MQTT_USERNAME:
+        mqtt_client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
 
     try:
-        mqtt_client.connect(
-            "fd2249eedb6c43fdbf9e9d318ab38fe4.s1.eu.hivemq.cloud", 8883
-        )
+        mqtt_client.connect(MQTT_HOST, MQTT_PORT)
         mqtt_client.loop_start()
-        mqtt_client.subscribe("#", qos=0)
-        print("✅ MQTT client connected — subscribed to all topics (#)")
+        print("✅ MQTT client connected — subscribing to configured camera topics")
     except Exception as e:
         print(f"❌ MQTT connect failed: {e}")
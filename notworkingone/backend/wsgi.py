@@ -0,0 +1,20 @@
+import os
+
+
+# Greenlet serving is for web workers only; cameras and MQTT stay in `SERVER_ROLE=ingest python app.py`.
+os.environ.setdefault("SERVER_ROLE", "web")
+
+if __name__ == "__main__":
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import app, start_services
+
+start_services()
+
+
+if __name__ == "__main__":
+    from gevent.pywsgi import WSGIServer
+
+    print("🚀 Serving on http://0.0.0.0:5000 (gevent)")
+    WSGIServer(("0.0.0.0", 5000), app).serve_forever()
@@ -9,6 +9,7 @@ class DetectionService {
     this.detectionHistory = []
     this.isPolling = false
     this.pollInterval = null
+    this.eventSource = null
     this.lastCheckTime = 'Never'
     this.isConnected = false
     this.token = null
@@ -43,6 +44,10 @@ class DetectionService {
     this.isPolling = true
     this.token = token
 
+    if (typeof window !== 'undefined' && 'EventSource' in window) {
+      this.startEventStream()
+      return
+    }
 
     this.checkDetection()
 
@@ -52,11 +57,40 @@ class DetectionService {
     }, 1000)
   }
 
+  startEventStream() {
+    this.eventSource = new EventSource(`/api/detection-events?token=${encodeURIComponent(this.token)}`)
+
+    this.eventSource.onopen = () => {
+      this.isConnected = true
+      this.notifyListeners()
+    }
+
+    this.eventSource.onerror = () => {
+      // EventSource reconnects on its own (server sends retry: 3000).
+      this.isConnected = false
+      this.notifyListeners()
+    }
+
+    const onEvent = (event) => {
+      try {
+        this.handleDetection(JSON.parse(event.data))
+      } catch (error) {
+        console.error('Error handling detection event:', error)
+      }
+    }
+    this.eventSource.addEventListener('snapshot', onEvent)
+    this.eventSource.addEventListener('detection', onEvent)
+  }
+
   stopPolling() {
     if (this.pollInterval) {
       clearInterval(this.pollInterval)
       this.pollInterval = null
     }
+    if (this.eventSource) {
+      this.eventSource.close()
+      this.eventSource = null
+    }
     this.isPolling = false
   }
 
@@ -70,40 +104,7 @@ class DetectionService {
       })
 
       if (response.ok) {
-        const data = await response.json()
-        this.isConnected = true
-        this.lastCheckTime = new Date().toLocaleTimeString()
-
-        const hasObjects = data.objects && Object.keys(data.objects).length > 0
-        const isNewDetection = data.detected && hasObjects &&
-          data.timestamp &&
-          data.timestamp !== this.lastTimestamp
-
-        if (isNewDetection) {
-          this.lastTimestamp = data.timestamp
-
-          this.detectionHistory.unshift({
-            detected: data.detected,
-            objects: data.objects,
-            timestamp: data.timestamp
-          })
-
-          if (this.detectionHistory.length > 50) {
-            this.detectionHistory = this.detectionHistory.slice(0, 50)
-          }
-
-          this.playAlertSound()
-          this.showNotification(data)
-
-          if (data.latest_incident_id && data.latest_incident_id !== this.lastIncidentId) {
-            this.lastIncidentId = data.latest_incident_id;
-            await this.fetchAndSetIncidentAlert(data.latest_incident_id)
-          }
-        }
-
-
-        this.currentDetection = data
-        this.notifyListeners()
+        await this.handleDetection(await response.json())
       } else {
         this.isConnected = false
         this.notifyListeners()
@@ -117,6 +118,51 @@ class DetectionService {
 
 
 
+  async handleDetection(data) {
+    this.isConnected = true
+    this.lastCheckTime = new Date().toLocaleTimeString()
+
+    const hasObjects = data.objects && Object.keys(data.objects).length > 0
+    const isNewDetection = data.detected && hasObjects &&
+      data.timestamp &&
+      data.timestamp !== this.lastTimestamp
+
+    if (isNewDetection) {
+      this.lastTimestamp = data.timestamp
+
+      this.detectionHistory.unshift({
+        detected: data.detected,
+        objects: data.objects,
+        timestamp: data.timestamp
+      })
+
+      if (this.detectionHistory.length > 50) {
+        this.detectionHistory = this.detectionHistory.slice(0, 50)
+      }
+
+      this.playAlertSound()
+      this.showNotification(data)
+    }
+
+    // The incident can arrive in a later event than the detection that caused it.
+    if (data.latest_incident_id && data.latest_incident_id !== this.lastIncidentId) {
+      this.lastIncidentId = data.latest_incident_id
+      if (data.incident) {
+        this.currentAlert = {
+          id: data.latest_incident_id,
+          incident: data.incident,
+          timestamp: Date.now()
+        }
+      } else if (isNewDetection) {
+        await this.fetchAndSetIncidentAlert(data.latest_incident_id)
+      }
+    }
+
+
+    this.currentDetection = data
+    this.notifyListeners()
+  }
+
   async fetchAndSetIncidentAlert(incidentId) {
     try {
       const response = await fetch(`/api/incidents/${incidentId}`, {